@@ -0,0 +1,250 @@
+# Description: Bulk IP -> ASN/organisation lookups over tech_companies_summary.txt
+# Author: James Sawyer
+# Email: githubtools@jamessawyer.co.uk
+# Website: http://www.jamessawyer.co.uk/
+
+"""Turns the psql-rendered table in tech_companies_summary.txt into a compact
+binary index and answers batch lookups against it.
+
+The index is a directory of .npy files (sorted start/end addresses plus an
+organisation ID per network) that is memory-mapped on load, so starting up
+costs a few page faults instead of re-parsing 10k text rows. IPv4 networks are
+stored as uint32 and IPv6 networks as (high, low) uint64 halves.
+
+Usage:
+    python asn_lookup.py 8.18.221.10 2620:127:d011::1
+    tail -f access.log | awk '{print $1}' | python asn_lookup.py --stdin
+"""
+
+import argparse
+import ipaddress
+import json
+import logging
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from tabulate import tabulate
+
+from subnet_calculator import ipv4_to_uint32, ipv6_to_pairs, searchsorted_v6
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format="%(asctime)s [%(levelname)s] %(message)s",
+                    datefmt="%Y-%m-%d %H:%M:%S")
+
+SUMMARY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tech_companies_summary.txt")
+DEFAULT_INDEX_DIR = os.path.join(os.path.expanduser("~"), ".cache", "asn_lookup")
+# Number of addresses read from stdin before each batch lookup
+STDIN_BATCH = 65536
+
+ARRAY_NAMES = (
+    "ipv4_start", "ipv4_end", "ipv4_org",
+    "ipv6_start_high", "ipv6_start_low", "ipv6_end_high", "ipv6_end_low", "ipv6_org",
+    "org_asn",
+)
+
+
+def parse_summary(path=SUMMARY_FILE):
+    """
+    Parse the psql table in tech_companies_summary.txt.
+
+    Returns:
+        pandas.DataFrame: network, asn and organization columns.
+    """
+    records = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if not line.startswith("|"):
+                continue
+            cells = [cell.strip() for cell in line.strip().strip("|").split("|")]
+            if len(cells) != 4 or not cells[2].isdigit():
+                # Header row or anything else that is not a data row
+                continue
+            records.append({"network": cells[1], "asn": int(cells[2]), "organization": cells[3]})
+
+    logging.info(f"Parsed {len(records)} networks from {path}")
+    return pd.DataFrame(records, columns=["network", "asn", "organization"])
+
+
+def _flatten_ranges(ranges):
+    """
+    Resolve nested (start, end, org) ranges into disjoint segments.
+
+    CIDR networks either nest or are disjoint, so a sweep over the ranges
+    sorted by start (widest first) with a stack of enclosing networks is
+    enough; inside a nested network the most specific prefix wins.
+
+    Returns:
+        list: (start, end, org) tuples sorted by start, none overlapping.
+    """
+    segments = []
+    stack = []
+    cursor = 0
+    for start, end, org in sorted(ranges, key=lambda r: (r[0], -r[1])):
+        while stack and stack[-1][0] < start:
+            outer_end, outer_org = stack.pop()
+            if cursor <= outer_end:
+                segments.append((cursor, outer_end, outer_org))
+            cursor = outer_end + 1
+        if stack and cursor < start:
+            segments.append((cursor, start - 1, stack[-1][1]))
+        stack.append((end, org))
+        cursor = start
+    while stack:
+        outer_end, outer_org = stack.pop()
+        if cursor <= outer_end:
+            segments.append((cursor, outer_end, outer_org))
+        cursor = outer_end + 1
+    return segments
+
+
+def build_index(df, index_dir=DEFAULT_INDEX_DIR):
+    """
+    Write the binary index for a parsed summary to `index_dir`.
+
+    Each distinct (asn, organization) pair gets an organisation ID. Networks
+    are flattened into disjoint segments sorted by start address; where
+    prefixes nest, addresses resolve to the most specific one.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+
+    orgs = df[["asn", "organization"]].drop_duplicates().reset_index(drop=True)
+    org_ids = pd.MultiIndex.from_frame(orgs).get_indexer(pd.MultiIndex.from_frame(df[["asn", "organization"]]))
+
+    networks = [ipaddress.ip_network(n) for n in df["network"]]
+    ranges = {4: [], 6: []}
+    for network, org_id in zip(networks, org_ids):
+        ranges[network.version].append((int(network.network_address), int(network.broadcast_address), int(org_id)))
+
+    arrays = {"org_asn": orgs["asn"].to_numpy(dtype=np.uint32)}
+
+    ipv4 = _flatten_ranges(ranges[4])
+    arrays["ipv4_start"] = np.array([start for start, _, _ in ipv4], dtype=np.uint32)
+    arrays["ipv4_end"] = np.array([end for _, end, _ in ipv4], dtype=np.uint32)
+    arrays["ipv4_org"] = np.array([org for _, _, org in ipv4], dtype=np.int32)
+
+    ipv6 = _flatten_ranges(ranges[6])
+    arrays["ipv6_start_high"] = np.array([start >> 64 for start, _, _ in ipv6], dtype=np.uint64)
+    arrays["ipv6_start_low"] = np.array([start & 0xFFFFFFFFFFFFFFFF for start, _, _ in ipv6], dtype=np.uint64)
+    arrays["ipv6_end_high"] = np.array([end >> 64 for _, end, _ in ipv6], dtype=np.uint64)
+    arrays["ipv6_end_low"] = np.array([end & 0xFFFFFFFFFFFFFFFF for _, end, _ in ipv6], dtype=np.uint64)
+    arrays["ipv6_org"] = np.array([org for _, _, org in ipv6], dtype=np.int32)
+
+    for name in ARRAY_NAMES:
+        np.save(os.path.join(index_dir, f"{name}.npy"), arrays[name])
+    with open(os.path.join(index_dir, "org_names.json"), "w", encoding="utf-8") as fh:
+        json.dump(orgs["organization"].tolist(), fh)
+
+    logging.info(f"Wrote index for {len(ranges[4])} IPv4 and {len(ranges[6])} IPv6 networks "
+                 f"({len(ipv4)} and {len(ipv6)} segments) to {index_dir}")
+
+
+class AsnIndex:
+    """Memory-mapped IP -> ASN/organisation index written by build_index."""
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR):
+        for name in ARRAY_NAMES:
+            setattr(self, name, np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r"))
+        with open(os.path.join(index_dir, "org_names.json"), encoding="utf-8") as fh:
+            self.org_names = np.array(json.load(fh), dtype=object)
+
+    def lookup_ipv4(self, addresses):
+        """
+        Return the organisation ID for each uint32 IPv4 address, -1 when unknown.
+        """
+        addresses = np.asarray(addresses, dtype=np.uint32)
+        if len(self.ipv4_start) == 0:
+            return np.full(addresses.shape, -1, dtype=np.int32)
+        pos = np.searchsorted(self.ipv4_start, addresses, side="right") - 1
+        safe = np.maximum(pos, 0)
+        hit = (pos >= 0) & (self.ipv4_end[safe] >= addresses)
+        return np.where(hit, self.ipv4_org[safe], -1)
+
+    def lookup_ipv6(self, high, low):
+        """
+        Return the organisation ID for each IPv6 address held as (high, low)
+        uint64 halves, -1 when unknown.
+        """
+        high = np.asarray(high, dtype=np.uint64)
+        low = np.asarray(low, dtype=np.uint64)
+        if len(self.ipv6_org) == 0:
+            return np.full(high.shape, -1, dtype=np.int32)
+        pos = searchsorted_v6(self.ipv6_start_high, self.ipv6_start_low, high, low) - 1
+        safe = np.maximum(pos, 0)
+        end_high = self.ipv6_end_high[safe]
+        end_low = self.ipv6_end_low[safe]
+        hit = (pos >= 0) & ((end_high > high) | ((end_high == high) & (end_low >= low)))
+        return np.where(hit, self.ipv6_org[safe], -1)
+
+    def lookup(self, ips):
+        """
+        Look up a mixed list of IPv4/IPv6 address strings.
+
+        Returns:
+            pandas.DataFrame: ip, asn and organization columns (asn is 0 and
+            organization missing when the address is not covered).
+        """
+        ips = pd.Series(list(ips), dtype=object)
+        is_ipv6 = ips.str.contains(":", regex=False).to_numpy()
+        org_ids = np.full(len(ips), -1, dtype=np.int64)
+
+        if (~is_ipv6).any():
+            org_ids[~is_ipv6] = self.lookup_ipv4(ipv4_to_uint32(ips[~is_ipv6]))
+        if is_ipv6.any():
+            org_ids[is_ipv6] = self.lookup_ipv6(*ipv6_to_pairs(ips[is_ipv6]))
+
+        known = org_ids >= 0
+        asn = np.zeros(len(ips), dtype=np.uint32)
+        asn[known] = self.org_asn[org_ids[known]]
+        organization = np.full(len(ips), None, dtype=object)
+        organization[known] = self.org_names[org_ids[known]]
+
+        return pd.DataFrame({"ip": ips, "asn": asn, "organization": organization})
+
+
+def load_index(index_dir=DEFAULT_INDEX_DIR, summary_path=SUMMARY_FILE):
+    """Open the index, (re)building it first if it is missing or older than the summary file."""
+    marker = os.path.join(index_dir, "org_names.json")
+    if not os.path.exists(marker) or os.path.getmtime(marker) < os.path.getmtime(summary_path):
+        logging.info("Building ASN index")
+        build_index(parse_summary(summary_path), index_dir)
+    return AsnIndex(index_dir)
+
+
+def _stream_stdin(index):
+    """Enrich addresses read line by line from stdin, writing CSV to stdout in batches."""
+    batch = []
+    for line in sys.stdin:
+        line = line.strip()
+        if line:
+            batch.append(line)
+        if len(batch) >= STDIN_BATCH:
+            index.lookup(batch).to_csv(sys.stdout, header=False, index=False)
+            batch = []
+    if batch:
+        index.lookup(batch).to_csv(sys.stdout, header=False, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Look up the ASN and organisation for IP addresses")
+    parser.add_argument("ips", nargs="*", help="IPv4/IPv6 addresses to look up")
+    parser.add_argument("--stdin", action="store_true", help="Read addresses from stdin and write CSV")
+    parser.add_argument("--summary", default=SUMMARY_FILE, help="Path to tech_companies_summary.txt")
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR, help="Directory holding the binary index")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index even if it is up to date")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        build_index(parse_summary(args.summary), args.index_dir)
+    index = load_index(args.index_dir, args.summary)
+
+    if args.stdin:
+        _stream_stdin(index)
+    elif args.ips:
+        print(tabulate(index.lookup(args.ips), headers="keys", tablefmt="psql", showindex=False))
+
+
+if __name__ == "__main__":
+    main()
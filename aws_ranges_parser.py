@@ -1,28 +1,181 @@
+import argparse
+import bisect
+import ipaddress
+import json
 import logging
+import os
+import pickle
+import re
+import tempfile
+import time
+
 import requests
+import numpy as np
 import pandas as pd
 from tabulate import tabulate
 
+from subnet_calculator import ipv4_to_uint32, ipv6_to_pairs, searchsorted_v6
+
 # Configure logging
 logging.basicConfig(level=logging.INFO,
                     format="%(asctime)s [%(levelname)s] %(message)s",
                     datefmt="%Y-%m-%d %H:%M:%S")
 
-def download_json_file(url):
+IP_RANGES_URL = "https://ip-ranges.amazonaws.com/ip-ranges.json"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "aws_ranges_parser")
+# Number of syncToken snapshots kept on disk for diffing
+KEEP_SNAPSHOTS = 10
+SNAPSHOT_NAME_RE = re.compile(r"^ip-ranges-(\d+)\.pkl$")
+
+
+def download_json_file(url, etag=None):
+    """
+    Download and parse a JSON document, optionally as a conditional GET.
+
+    When `etag` is given the request carries If-None-Match.
+
+    Returns:
+        tuple: (data, etag). data is None on failure and an empty dict when
+        the server answers 304 Not Modified.
+    """
+    headers = {"If-None-Match": etag} if etag else {}
     try:
-        response = requests.get(url, verify=False)
+        response = requests.get(url, headers=headers, timeout=30)
         response.raise_for_status()
     except requests.exceptions.RequestException as err:
         logging.error(f"HTTP request failed: {err}")
-        return None
+        return None, etag
+
+    etag = response.headers.get("ETag", etag)
+    if response.status_code == 304:
+        return {}, etag
 
     try:
         data = response.json()
     except ValueError:
         logging.error("Failed to parse JSON")
+        return None, etag
+
+    return data, etag
+
+
+def _atomic_write(path, payload):
+    """Write bytes to `path` via a temp file and rename so readers never see a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def snapshot_path(cache_dir, sync_token):
+    return os.path.join(cache_dir, f"ip-ranges-{sync_token}.pkl")
+
+
+def load_snapshot(cache_dir, sync_token):
+    """Load a cached syncToken snapshot as a dict with sync_token, create_date and index."""
+    with open(snapshot_path(cache_dir, sync_token), "rb") as fh:
+        snapshot = pickle.load(fh)
+    snapshot["index"] = PrefixIndex.from_state(snapshot.pop("index_state"))
+    return snapshot
+
+
+def _load_cached_snapshot(cache_dir, sync_token):
+    """Like load_snapshot, but return None (and drop the file) if the pickle is unreadable."""
+    try:
+        return load_snapshot(cache_dir, sync_token)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError,
+            KeyError, TypeError, ValueError) as err:
+        logging.warning(f"Discarding unreadable snapshot {sync_token}: {err}")
+        try:
+            os.unlink(snapshot_path(cache_dir, sync_token))
+        except OSError:
+            pass
         return None
 
-    return data
+
+def list_snapshots(cache_dir):
+    """Return the cached syncTokens, oldest first."""
+    if not os.path.isdir(cache_dir):
+        return []
+    matches = (SNAPSHOT_NAME_RE.match(name) for name in os.listdir(cache_dir))
+    return sorted((m.group(1) for m in matches if m), key=int)
+
+
+def load_ip_ranges(url=IP_RANGES_URL, cache_dir=DEFAULT_CACHE_DIR, max_age=0):
+    """
+    Return the current ip-ranges snapshot, using the on-disk cache where possible.
+
+    The snapshot holds the processed DataFrame and a ready-built PrefixIndex,
+    pickled per syncToken. A cache younger than `max_age` seconds is used
+    without touching the network; otherwise the file is revalidated with
+    If-None-Match and only downloaded and parsed when the ETag has changed.
+
+    Returns:
+        dict: sync_token, create_date and index (index.df is the DataFrame),
+        or None if nothing could be downloaded or loaded.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path = os.path.join(cache_dir, "ip-ranges.meta.json")
+    meta = {}
+    if os.path.exists(meta_path):
+        try:
+            with open(meta_path, encoding="utf-8") as fh:
+                meta = json.load(fh)
+            if not isinstance(meta, dict):
+                raise ValueError("not a JSON object")
+        except (OSError, ValueError) as err:
+            # Without a trustworthy ETag the next request has to be unconditional
+            logging.warning(f"Discarding unreadable cache metadata {meta_path}: {err}")
+            meta = {}
+
+    cached_token = meta.get("sync_token")
+    cached = None
+    if cached_token is not None and os.path.exists(snapshot_path(cache_dir, cached_token)):
+        # A corrupt snapshot is a cache miss: drop the ETag so the file is refetched
+        cached = _load_cached_snapshot(cache_dir, cached_token)
+
+    if cached is not None and time.time() - meta.get("checked_at", 0) < max_age:
+        logging.info(f"Using cached ip-ranges snapshot {cached_token}")
+        return cached
+
+    logging.info(f"Downloading JSON file from {url}")
+    data, etag = download_json_file(url, meta.get("etag") if cached is not None else None)
+
+    if data is None:
+        if cached is not None:
+            logging.warning(f"Download failed, falling back to cached snapshot {cached_token}")
+        return cached
+
+    meta["checked_at"] = time.time()
+    meta["etag"] = etag
+
+    if not data:
+        logging.info(f"ip-ranges.json not modified, using cached snapshot {cached_token}")
+        _atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+        return cached
+
+    meta["sync_token"] = data["syncToken"]
+    if not os.path.exists(snapshot_path(cache_dir, data["syncToken"])):
+        logging.info("Processing data")
+        index = PrefixIndex(process_data(data))
+        snapshot = {
+            "sync_token": data["syncToken"],
+            "create_date": data.get("createDate"),
+            "index_state": index.state(),
+        }
+        _atomic_write(snapshot_path(cache_dir, data["syncToken"]),
+                      pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL))
+        logging.info(f"Cached ip-ranges snapshot {data['syncToken']}")
+
+        for old_token in list_snapshots(cache_dir)[:-KEEP_SNAPSHOTS]:
+            os.unlink(snapshot_path(cache_dir, old_token))
+
+    _atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+    return load_snapshot(cache_dir, meta["sync_token"])
 
 def process_data(data):
     # Extract the 'prefixes' and 'ipv6_prefixes' into separate dataframes
@@ -34,35 +187,309 @@ def process_data(data):
     
     return combined_df
 
-def filter_and_sort(df):
-    # Filter rows in the London region
-    london_df = df[df['region'] == 'eu-west-2']
+def filter_and_sort(df, region='eu-west-2', service='AMAZON', aggregate=False):
+    # Filter rows in the requested region (London by default)
+    region_df = df[df['region'] == region]
+
+    # Filter rows with the requested service
+    service_df = region_df[region_df['service'] == service]
 
-    # Filter rows with the AMAZON service
-    amazon_df = london_df[london_df['service'] == 'AMAZON']
+    if aggregate:
+        # Collapse adjacent and overlapping prefixes into a minimal CIDR set
+        return aggregate_prefixes(service_df)
 
     # Sort by the column 'ip_prefix'
-    amazon_df.sort_values(by=['ip_prefix'], inplace=True)
+    service_df = service_df.sort_values(by=['ip_prefix'])
 
     # Reset the index
-    amazon_df.reset_index(drop=True, inplace=True)
+    service_df = service_df.reset_index(drop=True)
+
+    return service_df
+
+
+def _prefix_intervals(prefixes, version):
+    """Return sorted (first, last) address arrays for a list of CIDR strings of one IP version."""
+    # IPv6 addresses do not fit a fixed-width NumPy integer, so fall back to object arrays
+    dtype = np.uint64 if version == 4 else object
+    networks = [ipaddress.ip_network(p) for p in prefixes]
+    firsts = np.array([int(n.network_address) for n in networks], dtype=dtype)
+    lasts = np.array([int(n.broadcast_address) for n in networks], dtype=dtype)
+    order = np.argsort(firsts, kind='stable')
+    return firsts[order], lasts[order]
+
+
+def _merge_intervals(firsts, lasts):
+    """Merge sorted, possibly overlapping or adjacent intervals into disjoint ones."""
+    if len(firsts) == 0:
+        return firsts, lasts
+    reach = np.maximum.accumulate(lasts)
+    # A new run starts wherever an interval begins past the end of everything before it
+    new_run = np.ones(len(firsts), dtype=bool)
+    new_run[1:] = firsts[1:] > reach[:-1] + 1
+    run_ends = np.append(np.flatnonzero(new_run)[1:] - 1, len(firsts) - 1)
+    return firsts[new_run], reach[run_ends]
+
+
+def _covered(points, firsts, lasts):
+    """Return a mask of which points fall inside the disjoint sorted intervals."""
+    if len(firsts) == 0:
+        return np.zeros(len(points), dtype=bool)
+    pos = np.searchsorted(firsts, points, side='right') - 1
+    inside = pos >= 0
+    inside[inside] = lasts[pos[inside]] >= points[inside]
+    return inside
+
+
+def _subtract_intervals(a, b):
+    """Return the disjoint intervals covered by `a` but not by `b` (both merged)."""
+    a_firsts, a_lasts = a
+    b_firsts, b_lasts = b
+    if len(a_firsts) == 0:
+        return a
+    # Cut the address space at every interval edge and test each elementary segment
+    cuts = np.unique(np.concatenate([a_firsts, a_lasts + 1, b_firsts, b_lasts + 1]))
+    seg_firsts, seg_lasts = cuts[:-1], cuts[1:] - 1
+    keep = _covered(seg_firsts, a_firsts, a_lasts) & ~_covered(seg_firsts, b_firsts, b_lasts)
+    return _merge_intervals(seg_firsts[keep], seg_lasts[keep])
+
+
+def _intervals_to_cidrs(firsts, lasts, version):
+    """Express disjoint intervals as the minimal list of CIDR strings."""
+    address = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+    cidrs = []
+    for first, last in zip(firsts, lasts):
+        cidrs.extend(str(n) for n in ipaddress.summarize_address_range(address(int(first)), address(int(last))))
+    return cidrs
+
+
+def _group_intervals(df, by):
+    """Yield (group key, version, merged intervals) for every group and IP version in df."""
+    for version, column in ((4, 'ip_prefix'), (6, 'ipv6_prefix')):
+        if column not in df:
+            continue
+        rows = df[df[column].notna()]
+        for key, group in rows.groupby(list(by), sort=True):
+            yield key, version, _merge_intervals(*_prefix_intervals(group[column], version))
+
+
+def aggregate_prefixes(df, by=('region', 'service')):
+    """
+    Collapse the prefixes of each region/service into a minimal CIDR set.
+
+    Returns:
+        pandas.DataFrame: The `by` columns plus 'prefix', one row per aggregated CIDR.
+    """
+    records = []
+    for key, version, (firsts, lasts) in _group_intervals(df, by):
+        for cidr in _intervals_to_cidrs(firsts, lasts, version):
+            records.append(dict(zip(by, key), prefix=cidr))
+    return pd.DataFrame(records, columns=[*by, 'prefix'])
+
+
+def diff_prefixes(old_df, new_df, by=('region', 'service')):
+    """
+    Compare two ip-ranges snapshots at the address level.
+
+    Prefixes that were merely split or merged do not show up; only address
+    space that appeared or disappeared per region/service is reported, as a
+    minimal CIDR set.
+
+    Returns:
+        pandas.DataFrame: The `by` columns plus 'change' ("added"/"removed") and 'prefix'.
+    """
+    old_groups = {(key, version): iv for key, version, iv in _group_intervals(old_df, by)}
+    new_groups = {(key, version): iv for key, version, iv in _group_intervals(new_df, by)}
+
+    records = []
+    for group in sorted(old_groups.keys() | new_groups.keys(), key=lambda g: (g[1], g[0])):
+        key, version = group
+        empty = (np.array([], dtype=np.uint64 if version == 4 else object),) * 2
+        old_iv = old_groups.get(group, empty)
+        new_iv = new_groups.get(group, empty)
+        for change, (firsts, lasts) in (('added', _subtract_intervals(new_iv, old_iv)),
+                                        ('removed', _subtract_intervals(old_iv, new_iv))):
+            for cidr in _intervals_to_cidrs(firsts, lasts, version):
+                records.append(dict(zip(by, key), change=change, prefix=cidr))
+    return pd.DataFrame(records, columns=[*by, 'change', 'prefix'])
+
+
+def diff_snapshots(cache_dir, old_token, new_token, by=('region', 'service')):
+    """Diff two cached syncToken snapshots; see diff_prefixes."""
+    old_df = load_snapshot(cache_dir, old_token)["index"].df
+    new_df = load_snapshot(cache_dir, new_token)["index"].df
+    return diff_prefixes(old_df, new_df, by)
+
+
+class PrefixIndex:
+    """
+    Longest-prefix-match index over the IPv4 and IPv6 prefixes of ip-ranges.json.
+
+    Nested prefixes are flattened into disjoint, sorted address segments, each
+    owned by the most specific prefix covering it, so a lookup is a single
+    np.searchsorted over the segment starts. When the same prefix is listed for
+    several services the specific service wins over the catch-all AMAZON entry.
+    """
+
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+
+        ipv4_rows = self.df.index[self.df['ip_prefix'].notna()] if 'ip_prefix' in self.df else []
+        ipv6_rows = self.df.index[self.df['ipv6_prefix'].notna()] if 'ipv6_prefix' in self.df else []
+
+        starts, owners = self._build_segments(self.df, ipv4_rows, 'ip_prefix', 32)
+        self.ipv4_starts = np.array(starts, dtype=np.uint32)
+        self.ipv4_owners = np.array(owners, dtype=np.int64)
+
+        starts, owners = self._build_segments(self.df, ipv6_rows, 'ipv6_prefix', 128)
+        self.ipv6_high = np.array([s >> 64 for s in starts], dtype=np.uint64)
+        self.ipv6_low = np.array([s & 0xFFFFFFFFFFFFFFFF for s in starts], dtype=np.uint64)
+        self.ipv6_owners = np.array(owners, dtype=np.int64)
+
+        logging.info(f"Built prefix index: {len(self.ipv4_starts)} IPv4 and {len(self.ipv6_owners)} IPv6 segments")
+
+    def state(self):
+        """Return the index as plain DataFrame/array objects suitable for pickling."""
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild an index from state() without re-parsing any prefixes."""
+        index = cls.__new__(cls)
+        index.__dict__.update(state)
+        return index
+
+    @staticmethod
+    def _build_segments(df, rows, column, width):
+        """Flatten the prefixes in `rows` into sorted (segment start, owner row) lists."""
+        if len(rows) == 0:
+            return [], []
+
+        networks = [ipaddress.ip_network(p) for p in df.loc[rows, column]]
+        services = df.loc[rows, 'service'].tolist()
+
+        # Paint the least specific prefixes first so longer prefixes overwrite them
+        order = sorted(range(len(networks)), key=lambda i: (networks[i].prefixlen, services[i] != 'AMAZON'))
+
+        boundaries = set()
+        for net in networks:
+            boundaries.add(int(net.network_address))
+            if int(net.broadcast_address) + 1 < 2 ** width:
+                boundaries.add(int(net.broadcast_address) + 1)
+        boundaries = sorted(boundaries)
+
+        owners = np.full(len(boundaries), -1, dtype=np.int64)
+        for i in order:
+            net = networks[i]
+            lo = bisect.bisect_left(boundaries, int(net.network_address))
+            hi = bisect.bisect_right(boundaries, int(net.broadcast_address))
+            owners[lo:hi] = rows[i]
+
+        return boundaries, owners.tolist()
+
+    def lookup_ipv4(self, addresses):
+        """
+        Find the owning row for each address.
+
+        Args:
+            addresses (array-like): uint32 IPv4 addresses.
+
+        Returns:
+            numpy.ndarray: Row positions in self.df, -1 where no prefix matches.
+        """
+        addresses = np.asarray(addresses, dtype=np.uint32)
+        if len(self.ipv4_starts) == 0:
+            return np.full(addresses.shape, -1, dtype=np.int64)
+        pos = np.searchsorted(self.ipv4_starts, addresses, side='right') - 1
+        return np.where(pos >= 0, self.ipv4_owners[np.maximum(pos, 0)], -1)
+
+    def lookup_ipv6(self, high, low):
+        """
+        Find the owning row for each IPv6 address held as (high, low) uint64 halves.
+
+        Returns:
+            numpy.ndarray: Row positions in self.df, -1 where no prefix matches.
+        """
+        high = np.asarray(high, dtype=np.uint64)
+        low = np.asarray(low, dtype=np.uint64)
+        if len(self.ipv6_owners) == 0:
+            return np.full(high.shape, -1, dtype=np.int64)
+
+        pos = searchsorted_v6(self.ipv6_high, self.ipv6_low, high, low) - 1
+        return np.where(pos >= 0, self.ipv6_owners[np.maximum(pos, 0)], -1)
+
+    def lookup(self, ips):
+        """
+        Look up a mixed list of IPv4/IPv6 address strings.
+
+        Returns:
+            pandas.DataFrame: One row per input address with the matching prefix,
+            region, service and network border group (NaN when unmatched).
+        """
+        ips = pd.Series(list(ips), dtype=object)
+        is_ipv6 = ips.str.contains(':', regex=False).to_numpy()
+        rows = np.full(len(ips), -1, dtype=np.int64)
+
+        if (~is_ipv6).any():
+            rows[~is_ipv6] = self.lookup_ipv4(ipv4_to_uint32(ips[~is_ipv6]))
+        if is_ipv6.any():
+            rows[is_ipv6] = self.lookup_ipv6(*ipv6_to_pairs(ips[is_ipv6]))
+
+        matched = self.df.reindex(rows).reset_index(drop=True)
+        prefix = matched['ip_prefix'] if 'ip_prefix' in matched else pd.Series(np.nan, index=matched.index)
+        if 'ipv6_prefix' in matched:
+            prefix = prefix.fillna(matched['ipv6_prefix'])
+
+        return pd.DataFrame({
+            'ip': ips,
+            'prefix': prefix,
+            'region': matched['region'],
+            'service': matched['service'],
+            'network_border_group': matched['network_border_group'],
+        })
 
-    return amazon_df
 
 def main():
-    url = "https://ip-ranges.amazonaws.com/ip-ranges.json"
-    logging.info(f"Downloading JSON file from {url}")
-    data = download_json_file(url)
-    
-    if data is None:
+    parser = argparse.ArgumentParser(description="Download and query the AWS ip-ranges.json file")
+    parser.add_argument("--lookup", nargs="+", metavar="IP",
+                        help="Show the most specific AWS prefix and service for each IP")
+    parser.add_argument("--region", default="eu-west-2", help="Region to list")
+    parser.add_argument("--service", default="AMAZON", help="Service to list")
+    parser.add_argument("--aggregate", action="store_true",
+                        help="Collapse the listed prefixes into a minimal CIDR set")
+    parser.add_argument("--diff", nargs="*", metavar="SYNC_TOKEN",
+                        help="Show prefixes added/removed between two cached syncTokens (default: the latest two)")
+    parser.add_argument("--url", default=IP_RANGES_URL, help="Location of ip-ranges.json")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory for cached snapshots")
+    parser.add_argument("--max-age", type=int, default=0,
+                        help="Seconds a cached snapshot is trusted before revalidating with the server")
+    args = parser.parse_args()
+
+    if args.diff is not None:
+        tokens = args.diff or list_snapshots(args.cache_dir)[-2:]
+        if len(tokens) != 2:
+            logging.error("Need two cached syncTokens to diff")
+            return
+        logging.info(f"Diffing syncToken {tokens[0]} against {tokens[1]}")
+        diff_df = diff_snapshots(args.cache_dir, tokens[0], tokens[1])
+        diff_df = diff_df[(diff_df['region'] == args.region) & (diff_df['service'] == args.service)]
+        print(tabulate(diff_df.reset_index(drop=True), headers='keys', tablefmt='psql'))
+        return
+
+    snapshot = load_ip_ranges(args.url, args.cache_dir, args.max_age)
+
+    if snapshot is None:
         logging.error("Failed to download or parse JSON file")
         return
 
-    logging.info("Processing data")
-    df = process_data(data)
+    index = snapshot["index"]
+    df = index.df
+
+    if args.lookup:
+        print(tabulate(index.lookup(args.lookup), headers='keys', tablefmt='psql'))
+        return
 
     logging.info("Filtering and sorting data")
-    final_df = filter_and_sort(df)
+    final_df = filter_and_sort(df, args.region, args.service, args.aggregate)
 
     # Print the dataframe in a nice format
     print(tabulate(final_df, headers='keys', tablefmt='psql'))
@@ -1,5 +1,5 @@
 """ Description:
-This script extracts metadata from image files and returns it as a pandas dataframe. It uses the piexif library to extract metadata from the images, and the geopy library to convert GPS coordinates to place names.
+This script extracts metadata from image files and returns it as a pandas dataframe. It reads the EXIF block straight from each file's header bytes (no pixel decoding, Pillow only as a fallback for HEIC and other containers), and uses the geopy library to convert GPS coordinates to place names.
 
 Disclaimer: The information and content provided by me, is for informational purposes only. All content provided is the property of @James12396379, and any use or distribution of this content should include proper attribution to @James12396379.
 
@@ -10,107 +10,518 @@ Disclaimer: The information and content provided by me, is for informational pur
 # Website: http://www.jamessawyer.co.uk/
 # Twitter: https://twitter.com/James12396379
 
+import argparse
+import mmap
 import os
+import sqlite3
+import struct
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
+import numpy as np
 import pandas as pd
-import piexif
-from geopy.geocoders import Nominatim
-from PIL import Image
 from tabulate import tabulate
 
 
-# allows Pillow to open and manipulate images in the HEIF (i.e. HEIC) format
-from pillow_heif import register_heif_opener
-register_heif_opener()
+# Extensions whose EXIF block is found by reading the container header ourselves
+JPEG_EXTENSIONS = {".jpg", ".jpeg"}
+TIFF_EXTENSIONS = {".tif", ".tiff", ".cr2", ".nef", ".sr2", ".dng", ".arw", ".raw"}
+# Anything else is handed to Pillow, which still only parses the header
+IMAGE_EXTENSIONS = JPEG_EXTENSIONS | TIFF_EXTENSIONS | {".png", ".webp", ".heic", ".bmp", ".gif", ".psd"}
 
+# One buffered read covers the JPEG markers up to and including APP1 (max 64KB)
+HEADER_READ_SIZE = 1 << 17
+# Metadata is I/O bound (especially on a NAS), so threads are enough
+DEFAULT_WORKERS = 16
 
-def extract_metadata(dir_path):
+# Reverse geocoding: results are cached per grid cell of GEOCODE_GRID_DECIMALS
+# decimal places (3 -> ~110m), and Nominatim's usage policy allows 1 request/s
+DEFAULT_GEOCODE_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "exif_df", "geocode.sqlite")
+GEOCODE_GRID_DECIMALS = 3
+NOMINATIM_RATE = 1.0
+EARTH_RADIUS_KM = 6371.0088
+# No places file ships with this script; GeoNames publishes suitable dumps
+GEONAMES_DUMP_URL = "https://download.geonames.org/export/dump/cities500.zip"
+# Most memory the brute-force offline search (used without scipy) may take
+# for one chunk of query x place dot products
+OFFLINE_GEOCODE_MEMORY = 256 * 1024 * 1024
+# Returned by a geocoder for a point whose lookup failed, so it is not cached
+GEOCODE_FAILED = object()
+
+# Column types of the Parquet catalogue written by update_catalogue
+EXIF_DATETIME_FORMAT = "%Y:%m:%d %H:%M:%S"
+CATALOGUE_FLOAT_COLUMNS = ["gps_latitude", "gps_longitude", "gps_altitude"]
+CATALOGUE_DATETIME_COLUMNS = ["datetime", "date_time_original"]
+CATALOGUE_CATEGORY_COLUMNS = ["make", "model", "software"]
+
+# TIFF field type -> (struct format of one value, size in bytes)
+TIFF_TYPES = {
+    1: ("B", 1),    # BYTE
+    2: ("s", 1),    # ASCII
+    3: ("H", 2),    # SHORT
+    4: ("L", 4),    # LONG
+    5: ("LL", 8),   # RATIONAL
+    7: ("s", 1),    # UNDEFINED
+    9: ("l", 4),    # SLONG
+    10: ("ll", 8),  # SRATIONAL
+}
+
+# Tags we pull out of each IFD, mapped to their column names
+IFD0_TAGS = {0x010F: "make", 0x0110: "model", 0x0131: "software", 0x0132: "datetime"}
+EXIF_TAGS = {0x9003: "date_time_original"}
+GPS_TAGS = {
+    1: "gps_latitude_ref",
+    2: "gps_latitude",
+    3: "gps_longitude_ref",
+    4: "gps_longitude",
+    5: "gps_altitude_ref",
+    6: "gps_altitude",
+}
+EXIF_IFD_POINTER = 0x8769
+GPS_IFD_POINTER = 0x8825
+
+
+def _read_ifd(buf, tiff_start, ifd_offset, endian, wanted):
+    """
+    Reads the wanted tags from one IFD of a TIFF structure.
+
+    Args:
+        buf: bytes or mmap holding the TIFF structure.
+        tiff_start (int): Position of the TIFF header in `buf`; IFD offsets are relative to it.
+        ifd_offset (int): Offset of the IFD from the TIFF header.
+        endian (str): "<" or ">".
+        wanted (dict): Tag numbers to read (values are ignored here).
+
+    Returns:
+        dict: Tag number -> value. ASCII values are decoded, rationals are
+        (numerator, denominator) tuples and multi-value fields are tuples.
+    """
+    values = {}
+    position = tiff_start + ifd_offset
+    (count,) = struct.unpack_from(endian + "H", buf, position)
+    for index in range(count):
+        entry = position + 2 + index * 12
+        tag, field_type, value_count = struct.unpack_from(endian + "HHL", buf, entry)
+        if tag not in wanted or field_type not in TIFF_TYPES:
+            continue
+        fmt, size = TIFF_TYPES[field_type]
+        value_at = entry + 8
+        if size * value_count > 4:
+            value_at = tiff_start + struct.unpack_from(endian + "L", buf, value_at)[0]
+        if value_at + size * value_count > len(buf):
+            continue
+        if fmt == "s":
+            raw = bytes(buf[value_at:value_at + value_count])
+            values[tag] = raw.rstrip(b"\x00").decode("ascii", "replace").strip() if field_type == 2 else raw
+            continue
+        flat = struct.unpack_from(endian + fmt * value_count, buf, value_at)
+        if len(fmt) == 2:
+            flat = tuple(zip(flat[0::2], flat[1::2]))
+        values[tag] = flat[0] if value_count == 1 else flat
+    return values
+
+
+def parse_tiff(buf, tiff_start=0):
+    """
+    Extracts the metadata we report from a TIFF structure (the body of an EXIF block).
+
+    Only the IFDs and fields we need are touched, so when `buf` is an mmap only
+    those pages are ever read from disk.
+
+    Args:
+        buf: bytes or mmap holding the TIFF structure.
+        tiff_start (int): Position of the "II"/"MM" byte-order mark in `buf`.
+
+    Returns:
+        dict: Column name -> raw value for every field that was present.
+    """
+    byte_order = bytes(buf[tiff_start:tiff_start + 2])
+    if byte_order == b"II":
+        endian = "<"
+    elif byte_order == b"MM":
+        endian = ">"
+    else:
+        return {}
+
+    metadata = {}
+    try:
+        (ifd0_offset,) = struct.unpack_from(endian + "L", buf, tiff_start + 4)
+        ifd0 = _read_ifd(buf, tiff_start, ifd0_offset, endian, {**IFD0_TAGS, EXIF_IFD_POINTER: None, GPS_IFD_POINTER: None})
+        metadata.update({IFD0_TAGS[tag]: value for tag, value in ifd0.items() if tag in IFD0_TAGS})
+        if EXIF_IFD_POINTER in ifd0:
+            exif = _read_ifd(buf, tiff_start, ifd0[EXIF_IFD_POINTER], endian, EXIF_TAGS)
+            metadata.update({EXIF_TAGS[tag]: value for tag, value in exif.items()})
+        if GPS_IFD_POINTER in ifd0:
+            gps = _read_ifd(buf, tiff_start, ifd0[GPS_IFD_POINTER], endian, GPS_TAGS)
+            metadata.update({GPS_TAGS[tag]: value for tag, value in gps.items()})
+    except struct.error:
+        # Truncated or corrupt IFD: keep whatever was read before it
+        pass
+    return metadata
+
+
+def _jpeg_exif(path):
+    """Returns the TIFF body of the APP1 Exif segment of a JPEG, without reading past it."""
+    with open(path, "rb", buffering=HEADER_READ_SIZE) as fh:
+        if fh.read(2) != b"\xff\xd8":
+            return None
+        while True:
+            marker = fh.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            # Start of scan / end of image: the metadata segments are all before these
+            if marker[1] in (0xDA, 0xD9):
+                return None
+            length_bytes = fh.read(2)
+            if len(length_bytes) < 2:
+                return None
+            length = struct.unpack(">H", length_bytes)[0] - 2
+            if marker[1] == 0xE1:
+                segment = fh.read(length)
+                if segment.startswith(b"Exif\x00\x00"):
+                    return segment[6:]
+            else:
+                fh.seek(length, os.SEEK_CUR)
+
+
+def _png_exif(path):
+    """Returns the eXIf chunk of a PNG, stopping at the image data."""
+    with open(path, "rb", buffering=HEADER_READ_SIZE) as fh:
+        if fh.read(8) != b"\x89PNG\r\n\x1a\n":
+            return None
+        while True:
+            header = fh.read(8)
+            if len(header) < 8:
+                return None
+            length, chunk_type = struct.unpack(">L4s", header)
+            if chunk_type == b"eXIf":
+                return fh.read(length)
+            if chunk_type in (b"IDAT", b"IEND"):
+                return None
+            fh.seek(length + 4, os.SEEK_CUR)
+
+
+def _webp_exif(path):
+    """Returns the EXIF chunk of a WebP file."""
+    with open(path, "rb", buffering=HEADER_READ_SIZE) as fh:
+        header = fh.read(12)
+        if header[:4] != b"RIFF" or header[8:12] != b"WEBP":
+            return None
+        while True:
+            chunk = fh.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_type, length = struct.unpack("<4sL", chunk)
+            if chunk_type == b"EXIF":
+                data = fh.read(length)
+                return data[6:] if data.startswith(b"Exif\x00\x00") else data
+            # Chunks are padded to an even length
+            fh.seek(length + (length & 1), os.SEEK_CUR)
+
+
+def _tiff_metadata(path):
+    """Parses a TIFF-based file (TIFF and most camera raw formats) through an mmap."""
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return {}
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return parse_tiff(mm)
+
+
+def _pil_exif(path):
+    """Fallback for containers we do not parse ourselves (HEIC, PSD, ...)."""
+    # Imported here so the common JPEG/TIFF path never pays for Pillow and the HEIF plugin
+    from PIL import Image
+    # allows Pillow to open and manipulate images in the HEIF (i.e. HEIC) format
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+
+    # Image.open only reads the header; the pixels are never decoded here
+    with Image.open(path) as img:
+        exif = img.info.get("exif")
+    if not exif:
+        return None
+    return exif[6:] if exif.startswith(b"Exif\x00\x00") else exif
+
+
+EXIF_READERS = {".png": _png_exif, ".webp": _webp_exif}
+EXIF_READERS.update({ext: _jpeg_exif for ext in JPEG_EXTENSIONS})
+
+
+def read_metadata(path):
+    """
+    Extracts the metadata of one image file from its header bytes only.
+
+    Args:
+        path (str): Path to the image file.
+
+    Returns:
+        dict: The file's metadata. GPS fields hold the raw EXIF rationals;
+        convert_gps turns a whole frame of them into decimal degrees at once.
+        Fields missing from the file are None.
     """
-    Extracts the metadata from all the image files in the specified directory and
-    returns it as a pandas dataframe.
+    extension = os.path.splitext(path)[1].lower()
+    if extension in TIFF_EXTENSIONS:
+        raw = _tiff_metadata(path)
+    else:
+        tiff = EXIF_READERS.get(extension, _pil_exif)(path)
+        raw = parse_tiff(tiff) if tiff else {}
+
+    metadata = {
+        'filename': os.path.basename(path),
+        'path': path,
+        'gps_latitude': raw.get('gps_latitude'),
+        'gps_latitude_ref': raw.get('gps_latitude_ref'),
+        'gps_longitude': raw.get('gps_longitude'),
+        'gps_longitude_ref': raw.get('gps_longitude_ref'),
+        'gps_altitude': raw.get('gps_altitude'),
+        'gps_altitude_ref': raw.get('gps_altitude_ref'),
+        'make': raw.get('make'),
+        'model': raw.get('model'),
+        'software': raw.get('software'),
+        'datetime': raw.get('datetime'),
+        'date_time_original': raw.get('date_time_original'),
+    }
+    return metadata
+
+
+def _iter_image_entries(dir_path):
+    """Yields the os.DirEntry of every image file below `dir_path`."""
+    stack = [dir_path]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                    yield entry
+
+
+def iter_image_files(dir_path):
+    """
+    Yields the path of every image file below `dir_path`.
+
+    Uses os.scandir, whose directory entries already carry the file type, so
+    walking a large NAS share needs no extra stat call per file.
+    """
+    for entry in _iter_image_entries(dir_path):
+        yield entry.path
+
+
+def scan_image_files(dir_path):
+    """
+    Lists the image files below `dir_path` with their size and modification time.
+
+    Returns:
+        pandas.DataFrame: path, size and mtime_ns columns.
+    """
+    records = []
+    for entry in _iter_image_entries(dir_path):
+        stat = entry.stat()
+        records.append((entry.path, stat.st_size, stat.st_mtime_ns))
+    return pd.DataFrame(records, columns=["path", "size", "mtime_ns"]).astype({"size": "int64", "mtime_ns": "int64"})
+
+
+def iter_metadata(paths, workers=DEFAULT_WORKERS, include_errors=False):
+    """
+    Reads the metadata of many files in a thread pool and yields it as it arrives.
+
+    At most a few batches of files are in flight at once, so millions of paths
+    can be streamed without queuing a future for each of them.
+
+    Args:
+        paths (iterable): Image file paths.
+        workers (int): Number of reader threads.
+        include_errors (bool): Also yield a {'path', 'error'} record for each
+            file that could not be read, instead of only reporting it.
+
+    Yields:
+        dict: One metadata record per file that could be read, in completion order.
+    """
+    paths = iter(paths)
+    max_in_flight = workers * 4
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = {}
+        while True:
+            for path in paths:
+                in_flight[executor.submit(read_metadata, path)] = path
+                if len(in_flight) >= max_in_flight:
+                    break
+            if not in_flight:
+                return
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = in_flight.pop(future)
+                try:
+                    record = future.result()
+                except Exception as e:
+                    print("[!] Error processing {}: {}".format(path, str(e)))
+                    if not include_errors:
+                        continue
+                    record = {'path': path, 'error': str(e)}
+                yield record
+
+
+def extract_metadata(dir_path, workers=DEFAULT_WORKERS):
+    """
+    Extracts the metadata from all the image files in the specified directory
+    (and its subdirectories) and returns it as a pandas dataframe.
 
     Args:
         dir_path (str): The path to the directory containing the image files.
+        workers (int): Number of reader threads.
 
     Returns:
         pandas.DataFrame: A dataframe containing the metadata of all the image files.
     """
-    metadata_list = []
-    for file in os.listdir(dir_path):
-        print("[+] Processing {}".format(file))
-        if file.endswith(".jpg") or file.endswith(".jpeg") or file.endswith(".png") or file.endswith(".tiff") or file.endswith(".bmp") or file.endswith(".gif") or file.endswith(
-                ".webp") or file.endswith(".psd") or file.endswith(".raw") or file.endswith(".cr2") or file.endswith(".nef") or file.endswith(".heic") or file.endswith(".sr2"):
-            print("[+] Extracting metadata from {}".format(file))
-            try:
-                with Image.open(os.path.join(dir_path, file)) as img:
-                    exif_data = piexif.load(img.info["exif"])
-                    print("[+] Metadata extracted from {}".format(file))
-
-                    # Extract GPS latitude, longitude, and altitude data
-                    gps_latitude = exif_data['GPS'][piexif.GPSIFD.GPSLatitude]
-                    gps_latitude_ref = exif_data['GPS'][piexif.GPSIFD.GPSLatitudeRef]
-                    gps_longitude = exif_data['GPS'][piexif.GPSIFD.GPSLongitude]
-                    gps_longitude_ref = exif_data['GPS'][piexif.GPSIFD.GPSLongitudeRef]
-                    gps_altitude = exif_data['GPS'][piexif.GPSIFD.GPSAltitude]
-                    gps_altitude_ref = exif_data['GPS'][piexif.GPSIFD.GPSAltitudeRef]
-
-                    # Convert GPS latitude and longitude data to decimal degrees
-                    gps_latitude_decimal = gps_to_decimal(
-                        gps_latitude, gps_latitude_ref)
-                    gps_longitude_decimal = gps_to_decimal(
-                        gps_longitude, gps_longitude_ref)
-
-                    metadata = {
-                        'filename': file,
-                        'gps_latitude': gps_latitude_decimal,
-                        'gps_longitude': gps_longitude_decimal,
-                        'gps_altitude': gps_altitude,
-                        'gps_altitude_ref': gps_altitude_ref,
-                        'make': exif_data['0th'][piexif.ImageIFD.Make],
-                        'model': exif_data['0th'][piexif.ImageIFD.Model],
-                        'software': exif_data['0th'][piexif.ImageIFD.Software],
-                        'datetime': exif_data['0th'][piexif.ImageIFD.DateTime],
-                        # 'exposure_time': exif_data['Exif'][piexif.ExifIFD.ExposureTime],
-                        # 'f_number': exif_data['Exif'][piexif.ExifIFD.FNumber],
-                        # 'iso_speed_ratings': exif_data['Exif'][piexif.ExifIFD.ISOSpeedRatings],
-                        # 'focal_length': exif_data['Exif'][piexif.ExifIFD.FocalLength],
-                        # 'focal_length_in_35mm_film': exif_data['Exif'][piexif.ExifIFD.FocalLengthIn35mmFilm],
-                        # 'exposure_mode': exif_data['Exif'][piexif.ExifIFD.ExposureMode],
-                        # 'white_balance': exif_data['Exif'][piexif.ExifIFD.WhiteBalance],
-                        # 'metering_mode': exif_data['Exif'][piexif.ExifIFD.MeteringMode],
-                        # 'flash': exif_data['Exif'][piexif.ExifIFD.Flash],
-                        # 'exposure_program': exif_data['Exif'][piexif.ExifIFD.ExposureProgram],
-                        # 'exif_version': exif_data['Exif'][piexif.ExifIFD.ExifVersion],
-                        # 'date_time_original': exif_data['Exif'][piexif.ExifIFD.DateTimeOriginal],
-                        # 'date_time_digitized': exif_data['Exif'][piexif.ExifIFD.DateTimeDigitized],
-                        # 'components_configuration': exif_data['Exif'][piexif.ExifIFD.ComponentsConfiguration],
-                        # 'compressed_bits_per_pixel': exif_data['Exif'][piexif.ExifIFD.CompressedBitsPerPixel],
-                        # 'shutter_speed_value': exif_data['Exif'][piexif.ExifIFD.ShutterSpeedValue],
-                        # 'aperture_value': exif_data['Exif'][piexif.ExifIFD.ApertureValue],
-                        # 'brightness_value': exif_data['Exif'][piexif.ExifIFD.BrightnessValue],
-                        # 'exposure_bias_value': exif_data['Exif'][piexif.ExifIFD.ExposureBiasValue],
-                        # 'max_aperture_value': exif_data['Exif'][piexif.ExifIFD.MaxApertureValue],
-                        # 'subject_distance': exif_data['Exif'][piexif.ExifIFD.SubjectDistance],
-                        # 'metering_mode': exif_data['Exif'][piexif.ExifIFD.MeteringMode],
-                        # 'light_source': exif_data['Exif'][piexif.ExifIFD.LightSource],
-                        # 'flash': exif_data['Exif'][piexif.ExifIFD.Flash],
-                        # 'focal_length': exif_data['Exif'][piexif.ExifIFD.FocalLength],
-                        # 'subject_area': exif_data['Exif'][piexif.ExifIFD.SubjectArea],
-
-                    }
-
-                    print("-----------------------------")
-
-                    metadata_list.append(metadata)
-            except Exception as e:
-                print("[!] Error processing {}: {}".format(file, str(e)))
+    metadata_list = list(iter_metadata(iter_image_files(dir_path), workers))
+    print("[+] Metadata extracted from {} image files".format(len(metadata_list)))
 
     # Convert the metadata list to a pandas dataframe
-    metadata_df = pd.DataFrame(metadata_list)
+    metadata_df = convert_gps(pd.DataFrame(metadata_list))
 
     return metadata_df
 
 
+def type_catalogue(df):
+    """
+    Gives a metadata dataframe the column types used by the catalogue.
+
+    GPS fields become float64 (NaN when missing), EXIF timestamps datetime64
+    (NaT when missing or malformed) and the low-cardinality camera strings
+    categorical, which keeps both the Parquet file and the loaded frame small.
+    """
+    df = convert_gps(df)
+    for column in CATALOGUE_FLOAT_COLUMNS:
+        if column in df:
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("float64")
+    if "gps_altitude_ref" in df:
+        df["gps_altitude_ref"] = pd.to_numeric(df["gps_altitude_ref"], errors="coerce").astype("Int8")
+    for column in CATALOGUE_DATETIME_COLUMNS:
+        if column in df and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column], format=EXIF_DATETIME_FORMAT, errors="coerce")
+    for column in CATALOGUE_CATEGORY_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype(str).where(df[column].notna()).astype("category")
+    return df
+
+
+def _write_parquet(df, path):
+    """Writes the catalogue via a temp file and rename so a crash never leaves a partial file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".parquet")
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def update_catalogue(dir_path, catalogue_path, workers=DEFAULT_WORKERS):
+    """
+    Brings a Parquet catalogue of the image files below `dir_path` up to date.
+
+    Files are keyed on path, size and mtime: rows for unchanged files are kept
+    from the existing catalogue, only new or modified files are read, and rows
+    for files that no longer exist are dropped. Files that cannot be read are
+    kept as rows with the message in the `error` column (None for good rows),
+    so they are only retried once they change.
+
+    Args:
+        dir_path (str): The path to the directory containing the image files.
+        catalogue_path (str): The Parquet file to read and rewrite.
+        workers (int): Number of reader threads.
+
+    Returns:
+        pandas.DataFrame: The updated, typed catalogue.
+    """
+    files = scan_image_files(dir_path)
+    if os.path.exists(catalogue_path):
+        catalogue = pd.read_parquet(catalogue_path)
+    else:
+        catalogue = pd.DataFrame(columns=["path", "size", "mtime_ns"])
+
+    known = files.merge(catalogue[["path", "size", "mtime_ns"]], on=["path", "size", "mtime_ns"], how="left", indicator=True)
+    unchanged = catalogue[catalogue["path"].isin(known.loc[known["_merge"] == "both", "path"])]
+    stale = files[(known["_merge"] == "left_only").to_numpy()]
+    removed = (~catalogue["path"].isin(files["path"])).sum()
+    print("[+] Catalogue: {} unchanged, {} new or modified, {} removed".format(len(unchanged), len(stale), removed))
+
+    fresh = pd.DataFrame(list(iter_metadata(stale["path"], workers, include_errors=True)))
+    if not fresh.empty:
+        fresh = fresh.merge(stale, on="path", how="left")
+
+    parts = [part for part in (unchanged, type_catalogue(fresh)) if not part.empty]
+    updated = type_catalogue(pd.concat(parts, ignore_index=True)) if parts else type_catalogue(fresh)
+    if "path" in updated and "error" not in updated:
+        updated["error"] = None
+    if "path" in updated:
+        updated = updated.sort_values("path", ignore_index=True)
+    _write_parquet(updated, catalogue_path)
+    return updated
+
+
+def _rational_array(values, count):
+    """
+    Packs EXIF rationals into a float array of shape (n, count, 2).
+
+    Each value is a tuple of `count` (numerator, denominator) pairs, or a
+    single pair when count is 1; anything else (missing or malformed) becomes
+    NaN so it drops out of the vectorized maths.
+    """
+    out = np.full((len(values), count, 2), np.nan)
+    for row, value in enumerate(values):
+        if count == 1:
+            value = (value,)
+        if isinstance(value, tuple) and len(value) == count and all(isinstance(v, tuple) and len(v) == 2 for v in value):
+            out[row] = value
+    return out
+
+
+def gps_to_decimal_many(coords, refs):
+    """
+    Converts many GPS coordinates to decimal degrees at once.
+
+    Args:
+        coords (array-like): Shape (n, 3, 2): degrees, minutes and seconds as
+            (numerator, denominator) pairs.
+        refs (array-like): The reference direction of each coordinate (N, S, E, W).
+
+    Returns:
+        numpy.ndarray: float64 decimal degrees, negative for S and W, NaN where
+        the coordinate is missing or has a zero denominator.
+    """
+    coords = np.asarray(coords, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        parts = coords[..., 0] / coords[..., 1]
+    parts[~np.isfinite(parts)] = np.nan
+    decimal = parts @ np.array([1.0, 1 / 60, 1 / 3600])
+    return np.where(np.isin(np.asarray(refs, dtype=object), ["S", "W"]), -decimal, decimal)
+
+
+def altitude_to_metres(altitudes, refs):
+    """
+    Converts GPS altitudes to metres above sea level.
+
+    Args:
+        altitudes (array-like): Shape (n, 2) (numerator, denominator) pairs.
+        refs (array-like): GPSAltitudeRef for each altitude; 1 means below sea level.
+
+    Returns:
+        numpy.ndarray: float64 metres, negative below sea level, NaN when missing.
+    """
+    altitudes = np.asarray(altitudes, dtype=float).reshape(-1, 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        metres = altitudes[:, 0] / altitudes[:, 1]
+    metres[~np.isfinite(metres)] = np.nan
+    below = pd.to_numeric(pd.Series(refs, dtype=object), errors="coerce").to_numpy() == 1
+    return np.where(below, -metres, metres)
+
+
 def gps_to_decimal(coord, ref):
     """
     Converts GPS coordinates to decimal degrees.
@@ -122,32 +533,330 @@ def gps_to_decimal(coord, ref):
     Returns:
         float: The GPS coordinates in decimal degrees.
     """
-    decimal = coord[0][0] / coord[0][1] + coord[1][0] / \
-        (60 * coord[1][1]) + coord[2][0] / (3600 * coord[2][1])
-    if ref in ['S', 'W']:
-        decimal *= -1
-    return decimal
+    return float(gps_to_decimal_many(_rational_array([coord], 3), [ref])[0])
 
 
-def get_place_name(latitude, longitude):
-    location = geolocator.reverse(f"{latitude}, {longitude}", exactly_one=True)
-    if location is None:
-        return None
-    else:
-        return location.address
+def convert_gps(df):
+    """
+    Replaces the raw GPS rationals read by read_metadata with decimal degrees
+    and signed metres, a whole column at a time.
+
+    The latitude/longitude refs are folded into the sign and dropped; the
+    altitude ref is kept. Columns that are already numeric are left alone.
+    """
+    df = df.copy()
+    for column in ("gps_latitude", "gps_longitude"):
+        if column in df and df[column].dtype == object:
+            refs = df[f"{column}_ref"] if f"{column}_ref" in df else [None] * len(df)
+            df[column] = gps_to_decimal_many(_rational_array(df[column].tolist(), 3), refs)
+    if "gps_altitude" in df and df["gps_altitude"].dtype == object:
+        refs = df["gps_altitude_ref"] if "gps_altitude_ref" in df else [None] * len(df)
+        df["gps_altitude"] = altitude_to_metres(_rational_array(df["gps_altitude"].tolist(), 1), refs)
+    return df.drop(columns=["gps_latitude_ref", "gps_longitude_ref"], errors="ignore")
+
+
+class GpsIndex:
+    """
+    Spatial queries over many photo locations.
+
+    Points are sorted by latitude once, so a query only looks at the latitude
+    band it can match (two binary searches) before filtering on longitude or
+    distance with NumPy.
+    """
+
+    def __init__(self, latitudes, longitudes):
+        latitudes = np.asarray(latitudes, dtype=float)
+        longitudes = np.asarray(longitudes, dtype=float)
+        known = np.flatnonzero(~(np.isnan(latitudes) | np.isnan(longitudes)))
+        order = known[np.argsort(latitudes[known], kind="stable")]
+        self.rows = order
+        self.latitudes = latitudes[order]
+        self.longitudes = longitudes[order]
+
+    def _band(self, south, north):
+        start = np.searchsorted(self.latitudes, south, side="left")
+        stop = np.searchsorted(self.latitudes, north, side="right")
+        return slice(start, stop)
+
+    def bounding_box(self, south, west, north, east):
+        """
+        Returns the sorted row positions inside a bounding box, in degrees.
+
+        A box with west > east crosses the antimeridian.
+        """
+        band = self._band(south, north)
+        lon = self.longitudes[band]
+        inside = (lon >= west) & (lon <= east) if west <= east else (lon >= west) | (lon <= east)
+        return np.sort(self.rows[band][inside])
+
+    def within_radius(self, latitude, longitude, radius_km):
+        """Returns the sorted row positions within `radius_km` of a point (haversine distance)."""
+        delta = np.degrees(radius_km / EARTH_RADIUS_KM)
+        band = self._band(latitude - delta, latitude + delta)
+        lat = np.radians(self.latitudes[band])
+        lon = np.radians(self.longitudes[band])
+        lat0 = np.radians(latitude)
+        h = np.sin((lat - lat0) / 2) ** 2 + np.cos(lat0) * np.cos(lat) * np.sin((lon - np.radians(longitude)) / 2) ** 2
+        distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+        return np.sort(self.rows[band][distance <= radius_km])
+
+
+class TokenBucket:
+    """Token-bucket rate limiter: `rate` calls per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available and takes it."""
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                time.sleep((1 - self.tokens) / self.rate)
+
+
+class NominatimGeocoder:
+    """Online reverse geocoding through OpenStreetMap's Nominatim service."""
+
+    name = "nominatim"
+
+    def __init__(self, user_agent="exif_location", rate=NOMINATIM_RATE):
+        # Imported here so the offline backend works without geopy installed
+        from geopy.exc import GeopyError
+        from geopy.geocoders import Nominatim
+
+        self.geolocator = Nominatim(user_agent=user_agent)
+        self.bucket = TokenBucket(rate)
+        self.errors = GeopyError
+
+    def reverse_many(self, latitudes, longitudes):
+        """Returns the address of each point, None where there is none and
+        GEOCODE_FAILED where the lookup failed."""
+        places = []
+        for latitude, longitude in zip(latitudes, longitudes):
+            self.bucket.acquire()
+            try:
+                location = self.geolocator.reverse(f"{latitude}, {longitude}", exactly_one=True)
+            except self.errors as e:
+                print("[!] Geocoding {}, {} failed: {}".format(latitude, longitude, str(e)))
+                places.append(GEOCODE_FAILED)
+                continue
+            places.append(location.address if location is not None else None)
+        return places
+
+
+class OfflineGeocoder:
+    """
+    Reverse geocoding against a local places file: each point gets the name of
+    the nearest place.
+
+    The file is either a CSV with name, latitude and longitude columns (and an
+    optional country column) or a GeoNames dump such as cities500.txt. The
+    cache backend name covers the file's identity and the distance cutoff, so
+    changing either never serves names cached for the other.
+
+    Places are indexed in a k-d tree on the unit sphere when scipy is
+    installed; otherwise queries are compared with every place in chunks
+    sized to stay within OFFLINE_GEOCODE_MEMORY.
+    """
+
+    def __init__(self, places_path, max_distance_km=50.0):
+        if not os.path.isfile(places_path):
+            raise FileNotFoundError(
+                "Places file {} not found; download one such as {}".format(places_path, GEONAMES_DUMP_URL))
+        stat = os.stat(places_path)
+        self.name = "offline:{}:{}:{}:{}".format(
+            os.path.realpath(places_path), stat.st_mtime_ns, stat.st_size, max_distance_km)
+        if places_path.endswith(".txt"):
+            # GeoNames: tab separated, no header; name, latitude, longitude, country code
+            places = pd.read_csv(places_path, sep="\t", header=None, usecols=[1, 4, 5, 8],
+                                 names=["name", "latitude", "longitude", "country"],
+                                 quoting=3, keep_default_na=False, dtype={1: str, 8: str})
+        else:
+            places = pd.read_csv(places_path)
+        labels = places["name"].astype(str)
+        if "country" in places:
+            labels = labels + ", " + places["country"].astype(str)
+        self.labels = labels.to_numpy(dtype=object)
+        self.points = _unit_vectors(places["latitude"].to_numpy(float), places["longitude"].to_numpy(float))
+        # Dot product of unit vectors max_distance_km apart; nearer places score higher
+        self.min_dot = np.cos(max_distance_km / EARTH_RADIUS_KM)
+        # ... and the straight-line (chord) distance between them
+        self.max_chord = 2 * np.sin(max_distance_km / EARTH_RADIUS_KM / 2)
+        try:
+            # Imported here so the offline backend also works without scipy installed
+            from scipy.spatial import cKDTree
+        except ImportError:
+            self.tree = None
+        else:
+            self.tree = cKDTree(self.points)
+
+    def reverse_many(self, latitudes, longitudes):
+        """Returns the nearest place for each point, or None where none is close enough."""
+        queries = _unit_vectors(np.asarray(latitudes, float), np.asarray(longitudes, float))
+        places = np.full(len(queries), None, dtype=object)
+        if len(queries) == 0 or len(self.points) == 0:
+            return places.tolist()
+        if self.tree is not None:
+            # The nearest point by chord is also the nearest by great-circle distance
+            _, best = self.tree.query(queries, distance_upper_bound=self.max_chord)
+            close = best < len(self.points)
+            places[close] = self.labels[best[close]]
+            return places.tolist()
+
+        chunk_size = max(1, OFFLINE_GEOCODE_MEMORY // (8 * len(self.points)))
+        for start in range(0, len(queries), chunk_size):
+            # The largest dot product of unit vectors is the smallest great-circle distance
+            dots = queries[start:start + chunk_size] @ self.points.T
+            best = dots.argmax(axis=1)
+            close = dots[np.arange(len(best)), best] >= self.min_dot
+            places[start:start + chunk_size][close] = self.labels[best[close]]
+        return places.tolist()
+
+
+def _unit_vectors(latitudes, longitudes):
+    """Converts degrees to (n, 3) points on the unit sphere."""
+    lat = np.radians(latitudes)
+    lon = np.radians(longitudes)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+class GeocodeCache:
+    """SQLite cache of reverse geocoding results keyed on (backend, grid cell)."""
+
+    def __init__(self, path=DEFAULT_GEOCODE_CACHE):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS places ("
+            "backend TEXT, decimals INTEGER, lat_cell INTEGER, lon_cell INTEGER, place TEXT, "
+            "PRIMARY KEY (backend, decimals, lat_cell, lon_cell))")
+
+    def get_many(self, backend, decimals, cells):
+        """Returns {(lat_cell, lon_cell): place} for the cells that are cached."""
+        found = {}
+        cells = list(cells)
+        # Stay well below SQLite's limit on bound parameters
+        for start in range(0, len(cells), 400):
+            batch = cells[start:start + 400]
+            where = " OR ".join(["(lat_cell = ? AND lon_cell = ?)"] * len(batch))
+            rows = self.db.execute(
+                f"SELECT lat_cell, lon_cell, place FROM places WHERE backend = ? AND decimals = ? AND ({where})",
+                [backend, decimals] + [value for cell in batch for value in cell])
+            found.update({(lat_cell, lon_cell): place for lat_cell, lon_cell, place in rows})
+        return found
+
+    def put_many(self, backend, decimals, places):
+        """Stores {(lat_cell, lon_cell): place} in one transaction."""
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO places VALUES (?, ?, ?, ?, ?)",
+                [(backend, decimals, lat_cell, lon_cell, place) for (lat_cell, lon_cell), place in places.items()])
+
+
+def geocode_places(latitudes, longitudes, geocoder, cache=None, decimals=GEOCODE_GRID_DECIMALS, batch_size=100):
+    """
+    Reverse geocodes many points, looking up each grid cell only once.
+
+    Points are snapped to a grid of `decimals` decimal places. Each distinct
+    cell is answered from the cache if possible; the remaining cells are
+    geocoded at their centre in batches, and each batch is written to the
+    cache as soon as it is done so an interrupted run keeps its progress.
+
+    Args:
+        latitudes (array-like): Latitudes in decimal degrees (NaN for none).
+        longitudes (array-like): Longitudes in decimal degrees (NaN for none).
+        geocoder: NominatimGeocoder or OfflineGeocoder.
+        cache (GeocodeCache): Optional persistent cache.
+        decimals (int): Grid precision in decimal places.
+        batch_size (int): Cells geocoded between cache writes.
+
+    Returns:
+        list: The place name for each point, None where unknown.
+    """
+    latitudes = np.asarray(latitudes, dtype=float)
+    longitudes = np.asarray(longitudes, dtype=float)
+    places = [None] * len(latitudes)
+    valid = np.flatnonzero(~(np.isnan(latitudes) | np.isnan(longitudes)))
+    if len(valid) == 0:
+        return places
+
+    scale = 10 ** decimals
+    grid = np.column_stack((np.round(latitudes[valid] * scale), np.round(longitudes[valid] * scale))).astype(np.int64)
+    cells, inverse = np.unique(grid, axis=0, return_inverse=True)
+    keys = [tuple(cell) for cell in cells.tolist()]
+
+    resolved = cache.get_many(geocoder.name, decimals, keys) if cache is not None else {}
+    misses = [key for key in keys if key not in resolved]
+    print("[+] Geocoding {} points: {} grid cells, {} cached".format(len(valid), len(keys), len(keys) - len(misses)))
+
+    for start in range(0, len(misses), batch_size):
+        batch = misses[start:start + batch_size]
+        centres = np.array(batch, dtype=float) / scale
+        found = dict(zip(batch, geocoder.reverse_many(centres[:, 0], centres[:, 1])))
+        # Failed lookups stay out of the cache (and resolve to None) so the next run retries them
+        found = {key: place for key, place in found.items() if place is not GEOCODE_FAILED}
+        if cache is not None:
+            cache.put_many(geocoder.name, decimals, found)
+        resolved.update(found)
+
+    for position, cell_index in zip(valid, np.ravel(inverse)):
+        places[position] = resolved.get(keys[cell_index])
+    return places
+
+
+def get_place_name(latitude, longitude, geocoder, cache=None):
+    """Reverse geocodes a single point; see geocode_places."""
+    return geocode_places([latitude], [longitude], geocoder, cache)[0]
 
 
 if __name__ == "__main__":
-    # Define the directory containing the image files
-    dir_path = "PATH_TO_IMAGE_FILES"
+    parser = argparse.ArgumentParser(description="Extract image metadata into a dataframe")
+    parser.add_argument("dir_path", help="Directory containing the image files")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of reader threads")
+    parser.add_argument("--catalogue", help="Parquet catalogue to update incrementally instead of reading every file")
+    parser.add_argument("--places", help="Reverse geocode offline against this places file (CSV or GeoNames .txt, "
+                                         "e.g. cities500.txt from {}; none is bundled)".format(GEONAMES_DUMP_URL))
+    parser.add_argument("--geocode-cache", default=DEFAULT_GEOCODE_CACHE, help="SQLite file caching place names")
+    parser.add_argument("--grid-decimals", type=int, default=GEOCODE_GRID_DECIMALS,
+                        help="Decimal places of the grid used to share lookups between nearby photos")
+    parser.add_argument("--rate", type=float, default=NOMINATIM_RATE, help="Nominatim requests per second")
+    parser.add_argument("--no-geocode", action="store_true", help="Skip looking up place names")
+    parser.add_argument("--near", metavar="LAT,LON,KM", help="Only keep photos within KM kilometres of a point")
+    parser.add_argument("--bbox", metavar="SOUTH,WEST,NORTH,EAST", help="Only keep photos inside a bounding box")
+    args = parser.parse_args()
+    if args.places and not os.path.isfile(args.places):
+        parser.error("places file {} not found; download one such as {}".format(args.places, GEONAMES_DUMP_URL))
+
     # Extract the metadata from the image files
-    metadata_df = extract_metadata(dir_path)
-    print("[+] Metadata extracted from all image files")
+    if args.catalogue:
+        metadata_df = update_catalogue(args.dir_path, args.catalogue, args.workers)
+    else:
+        metadata_df = extract_metadata(args.dir_path, args.workers)
     print(metadata_df.columns)
-    geolocator = Nominatim(user_agent="exif_location")
-    metadata_df['place_name'] = metadata_df.apply(
-        lambda row: get_place_name(
-            row['gps_latitude'], row['gps_longitude']), axis=1)
+    if (args.near or args.bbox) and not metadata_df.empty:
+        index = GpsIndex(metadata_df['gps_latitude'], metadata_df['gps_longitude'])
+        if args.near:
+            rows = index.within_radius(*[float(v) for v in args.near.split(",")])
+        else:
+            rows = index.bounding_box(*[float(v) for v in args.bbox.split(",")])
+        metadata_df = metadata_df.iloc[rows].reset_index(drop=True)
+        print("[+] {} photos match the location filter".format(len(metadata_df)))
+    if not args.no_geocode and not metadata_df.empty:
+        geocoder = OfflineGeocoder(args.places) if args.places else NominatimGeocoder(rate=args.rate)
+        metadata_df['place_name'] = geocode_places(
+            metadata_df['gps_latitude'], metadata_df['gps_longitude'],
+            geocoder, GeocodeCache(args.geocode_cache), args.grid_decimals)
 
     # Print the dataframe
     print(tabulate(metadata_df, headers="keys", tablefmt="psql"))
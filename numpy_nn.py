@@ -21,7 +21,8 @@ numpy_nn.py
 
 A minimal neural network implementation using NumPy for regression on time series data (e.g., stock prices).
 - Demonstrates synthetic data generation and real CSV data loading.
-- Implements a simple feedforward neural network with one hidden layer.
+- Implements a feedforward network (Sequential) of fully connected layers and ReLUs, trained with
+  mini-batch SGD, SGD with momentum or Adam, in float64 or float32.
 - Includes manual normalization, training loop, early stopping, and prediction plotting.
 - Useful for educational purposes, prototyping, and understanding neural network fundamentals without external ML libraries.
 
@@ -36,6 +37,7 @@ Requirements:
 - matplotlib
 """
 
+import argparse
 import datetime
 import logging
 import sys
@@ -112,62 +114,361 @@ class Layer:
     Represents a fully connected neural network layer.
     """
 
-    def __init__(self, input_size, output_size):
+    def __init__(self, input_size, output_size, dtype=np.float64):
         # Xavier/Glorot uniform initialization for weights
         limit = np.sqrt(6 / (input_size + output_size))
-        self.weights = np.random.uniform(-limit, limit, (output_size, input_size))
-        self.biases = np.zeros((output_size, 1))
+        self.weights = np.random.uniform(-limit, limit, (output_size, input_size)).astype(dtype)
+        self.biases = np.zeros((output_size, 1), dtype=dtype)
+        # Gradient buffers, reused by every backward pass
+        self.grad_w = np.empty_like(self.weights)
+        self.grad_b = np.empty_like(self.biases)
         logger.debug(
             f"Initialized Layer: weights shape {self.weights.shape}, biases shape {self.biases.shape}"
         )
 
-    def forward(self, inputs):
+    def astype(self, dtype):
+        """Convert parameters and gradient buffers to `dtype` (e.g. np.float32)."""
+        self.weights = self.weights.astype(dtype)
+        self.biases = self.biases.astype(dtype)
+        self.grad_w = np.empty_like(self.weights)
+        self.grad_b = np.empty_like(self.biases)
+        return self
+
+    def parameters(self):
+        """(parameter, gradient) pairs for an optimizer."""
+        return [(self.weights, self.grad_w), (self.biases, self.grad_b)]
+
+    def output_size(self, input_size):
+        return self.weights.shape[0]
+
+    def forward(self, inputs, out=None):
         """
         Forward pass: compute weighted sum plus bias.
+        If `out` is given the result is written into it instead of a new array.
         """
         logger.debug(f"Layer forward: input shape {inputs.shape}")
-        return np.matmul(self.weights, inputs) + self.biases
+        if out is None:
+            return np.matmul(self.weights, inputs) + self.biases
+        np.matmul(self.weights, inputs, out=out)
+        out += self.biases
+        return out
 
-    def backward(self, previous_inputs, output_grad, learning_rate):
+    def gradients(self, previous_inputs, output_grad, input_grad=None, return_input_grad=True):
         """
-        Backward pass: update weights and biases using gradients.
+        Compute the clipped weight and bias gradients into grad_w and grad_b
+        and return the gradient for the previous layer (written into
+        `input_grad` when given, skipped with return_input_grad=False).
         """
-        grad_w = np.matmul(output_grad, previous_inputs.T)
-        grad_b = np.sum(output_grad, axis=1, keepdims=True)
+        np.matmul(output_grad, previous_inputs.T, out=self.grad_w)
+        np.sum(output_grad, axis=1, keepdims=True, out=self.grad_b)
         # Clip gradients to avoid exploding gradients
-        grad_w = np.clip(grad_w, -1, 1)
-        grad_b = np.clip(grad_b, -1, 1)
-        self.weights -= learning_rate * grad_w
-        self.biases -= learning_rate * grad_b
-        logger.debug(f"Layer backward: updated weights and biases")
-        # Return gradient for previous layer
-        return np.matmul(self.weights.T, output_grad)
+        np.clip(self.grad_w, -1, 1, out=self.grad_w)
+        np.clip(self.grad_b, -1, 1, out=self.grad_b)
+        if not return_input_grad:
+            return None
+        return np.matmul(self.weights.T, output_grad, out=input_grad)
+
+
+class ReLU:
+    """ReLU activation as a Sequential step."""
+
+    def astype(self, dtype):
+        return self
 
+    def parameters(self):
+        return []
 
-# --- Activation Functions ---
+    def output_size(self, input_size):
+        return input_size
 
+    def forward(self, inputs, out=None):
+        return np.maximum(inputs, 0, out=out)
 
-def relu(x):
-    """ReLU activation (elementwise)."""
-    return np.maximum(0, x)
+    def gradients(self, previous_inputs, output_grad, input_grad=None, return_input_grad=True):
+        """Pass the gradient through where the input was positive."""
+        if not return_input_grad:
+            return None
+        if input_grad is None:
+            return output_grad * (previous_inputs > 0)
+        np.greater(previous_inputs, 0, out=input_grad)
+        input_grad *= output_grad
+        return input_grad
 
 
-def relu_derivative(x):
-    """Derivative of ReLU."""
-    return (x > 0).astype(float)
+# --- Optimizers ---
 
 
-# --- Loss Functions ---
+class SGD:
+    """
+    Stochastic gradient descent, optionally with momentum.
+    Parameters are updated in place; the gradient buffers are used as scratch.
+    """
+
+    def __init__(self, learning_rate=0.001, momentum=0.0):
+        self.learning_rate = learning_rate
+        self.momentum = momentum
+        self.velocities = {}
+
+    def step(self, parameters):
+        for param, grad in parameters:
+            grad *= self.learning_rate
+            if not self.momentum:
+                param -= grad
+                continue
+            velocity = self.velocities.get(id(param))
+            if velocity is None:
+                velocity = self.velocities[id(param)] = np.zeros_like(param)
+            velocity *= self.momentum
+            velocity -= grad
+            param += velocity
+
+
+class Adam:
+    """
+    Adam optimizer (Kingma & Ba, 2014) with in-place moment and parameter updates.
+    """
+
+    def __init__(self, learning_rate=0.001, beta1=0.9, beta2=0.999, epsilon=1e-8):
+        self.learning_rate = learning_rate
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.epsilon = epsilon
+        self.t = 0
+        self.state = {}
+
+    def step(self, parameters):
+        self.t += 1
+        # Bias correction folded into the step size
+        step_size = self.learning_rate * np.sqrt(1 - self.beta2 ** self.t) / (1 - self.beta1 ** self.t)
+        for param, grad in parameters:
+            state = self.state.get(id(param))
+            if state is None:
+                state = self.state[id(param)] = (np.zeros_like(param), np.zeros_like(param), np.empty_like(param))
+            m, v, scratch = state
+            m *= self.beta1
+            np.multiply(grad, 1 - self.beta1, out=scratch)
+            m += scratch
+            v *= self.beta2
+            np.multiply(grad, grad, out=scratch)
+            scratch *= 1 - self.beta2
+            v += scratch
+            np.sqrt(v, out=scratch)
+            scratch += self.epsilon
+            np.divide(m, scratch, out=scratch)
+            scratch *= step_size
+            param -= scratch
+
+
+OPTIMIZERS = {
+    "sgd": lambda learning_rate: SGD(learning_rate),
+    "momentum": lambda learning_rate: SGD(learning_rate, momentum=0.9),
+    "adam": lambda learning_rate: Adam(learning_rate),
+}
+
+
+# --- Model ---
+
+
+class Sequential:
+    """
+    A stack of Layers and activations trained with shuffled mini-batches.
+
+    Every forward and backward intermediate lives in buffers allocated once
+    per batch size (a full batch, at most one smaller last batch and the
+    validation set), and all NumPy calls write into them through `out=`, so
+    the memory traffic of an epoch does not depend on how many batches it
+    has. Each epoch shuffles by drawing a permutation of sample indices and
+    gathering every batch into its buffers; the data itself is never
+    reordered. With dtype=np.float32 parameters, activations and optimizer
+    state are all single precision, halving the bytes moved per step.
+    """
 
+    def __init__(self, steps, dtype=np.float64):
+        self.steps = [step.astype(dtype) for step in steps]
+        self.dtype = np.dtype(dtype)
+        self._buffers = {}
+
+    def parameters(self):
+        return [pair for step in self.steps for pair in step.parameters()]
+
+    def get_weights(self):
+        return [param.copy() for param, _ in self.parameters()]
+
+    def set_weights(self, weights):
+        for (param, _), saved in zip(self.parameters(), weights):
+            np.copyto(param, saved)
+
+    def _buffers_for(self, n_features, n_outputs, batch_size):
+        if batch_size not in self._buffers:
+            sizes = [n_features]
+            for step in self.steps:
+                sizes.append(step.output_size(sizes[-1]))
+            activations = [np.empty((size, batch_size), dtype=self.dtype) for size in sizes]
+            grads = [np.empty((size, batch_size), dtype=self.dtype) for size in sizes]
+            y = np.empty((n_outputs, batch_size), dtype=self.dtype)
+            self._buffers[batch_size] = (activations, grads, y)
+        return self._buffers[batch_size]
+
+    def _forward(self, activations, grads, y):
+        for i, step in enumerate(self.steps):
+            step.forward(activations[i], out=activations[i + 1])
+        np.subtract(activations[-1], y, out=grads[-1])
+        # Sum of squared errors of the batch
+        return float(np.vdot(grads[-1], grads[-1]))
+
+    def _backward(self, activations, grads):
+        for i in range(len(self.steps) - 1, -1, -1):
+            self.steps[i].gradients(activations[i], grads[i + 1], input_grad=grads[i], return_input_grad=i > 0)
+
+    def train_epoch(self, inputs, y, optimizer, batch_size, rng):
+        """
+        Run one epoch of shuffled mini-batch training.
 
-def mse_loss(pred, true):
-    """Mean squared error loss."""
-    return np.mean((pred - true) ** 2)
+        inputs has shape (features, samples) and y (outputs, samples).
+        Returns the mean squared error over the epoch's batches.
+        """
+        n_samples = inputs.shape[1]
+        order = rng.permutation(n_samples)
+        parameters = self.parameters()
+        squared_error = 0.0
+        for start in range(0, n_samples, batch_size):
+            batch = order[start:start + batch_size]
+            activations, grads, batch_y = self._buffers_for(inputs.shape[0], y.shape[0], len(batch))
+            np.take(inputs, batch, axis=1, out=activations[0], mode="clip")
+            np.take(y, batch, axis=1, out=batch_y, mode="clip")
+            squared_error += self._forward(activations, grads, batch_y)
+            # MSE derivative: 2 * (pred - true) / n, already holding pred - true
+            grads[-1] *= 2 / batch_y.size
+            self._backward(activations, grads)
+            optimizer.step(parameters)
+        return squared_error / y.size
+
+    def evaluate(self, inputs, y):
+        """Mean squared error on a fixed dataset (e.g. validation), reusing its buffers."""
+        activations, grads, batch_y = self._buffers_for(inputs.shape[0], y.shape[0], inputs.shape[1])
+        np.copyto(activations[0], inputs)
+        np.copyto(batch_y, y)
+        return self._forward(activations, grads, batch_y) / y.size
+
+    def predict(self, inputs):
+        """Run forward pass for prediction."""
+        output = np.asarray(inputs, dtype=self.dtype)
+        for step in self.steps:
+            output = step.forward(output)
+        return output
+
+    def fit(
+        self,
+        inputs,
+        y,
+        optimizer,
+        epochs,
+        batch_size=32,
+        validation_data=None,
+        patience=10,
+        lr_patience=5,
+        min_learning_rate=1e-6,
+        log_every=100,
+        seed=42,
+        tag="",
+    ):
+        """
+        Train on (inputs, y) for up to `epochs` epochs.
 
+        With validation_data=(val_inputs, val_y) this is the self-healing loop:
+        the learning rate is halved after `lr_patience` epochs without
+        validation improvement, training stops after `patience` such epochs,
+        and the best weights seen are restored at the end. A non-empty `tag`
+        prefixes the per-epoch log lines, e.g. "[Synthetic]".
 
-def mse_loss_derivative(pred, true):
-    """Derivative of MSE loss."""
-    return 2 * (pred - true) / true.size
+        Returns:
+            dict: "loss" and "val_loss" per epoch.
+        """
+        inputs = np.ascontiguousarray(inputs, dtype=self.dtype)
+        y = np.ascontiguousarray(y, dtype=self.dtype)
+        if validation_data is not None:
+            val_inputs = np.ascontiguousarray(validation_data[0], dtype=self.dtype)
+            val_y = np.ascontiguousarray(validation_data[1], dtype=self.dtype)
+        rng = np.random.default_rng(seed)
+        history = {"loss": [], "val_loss": []}
+        prefix = f"{tag} " if tag else ""
+
+        # --- Self-healing feedback loop variables ---
+        best_val_loss = float("inf")
+        best_weights = None
+        epochs_since_improvement = 0
+        epochs_since_lr_reduce = 0
+
+        for epoch in range(epochs):
+            # Forward and backward passes over shuffled mini-batches
+            loss = self.train_epoch(inputs, y, optimizer, batch_size, rng)
+            history["loss"].append(loss)
+            if validation_data is None:
+                if log_every and epoch % log_every == 0:
+                    logger.info(f"{prefix}Epoch {epoch}, Loss: {loss:.4f}")
+                continue
+
+            # Validation loss
+            val_loss = self.evaluate(val_inputs, val_y)
+            history["val_loss"].append(val_loss)
+
+            # --- Feedback loop: self-healing fine-tuning ---
+            if val_loss < best_val_loss - 1e-6:  # Significant improvement
+                best_val_loss = val_loss
+                # Save best weights and biases
+                if best_weights is None:
+                    best_weights = self.get_weights()
+                else:
+                    for saved, (param, _) in zip(best_weights, self.parameters()):
+                        np.copyto(saved, param)
+                epochs_since_improvement = 0
+                epochs_since_lr_reduce = 0
+            else:
+                epochs_since_improvement += 1
+                epochs_since_lr_reduce += 1
+
+            # Reduce learning rate if no improvement for lr_patience epochs
+            if epochs_since_lr_reduce >= lr_patience:
+                old_lr = optimizer.learning_rate
+                optimizer.learning_rate = max(optimizer.learning_rate * 0.5, min_learning_rate)
+                logger.info(
+                    f"Reducing learning rate from {old_lr:.6f} to {optimizer.learning_rate:.6f} at epoch {epoch}"
+                )
+                epochs_since_lr_reduce = 0
+
+            # Early stopping if no improvement for 'patience' epochs
+            if epochs_since_improvement >= patience:
+                logger.info(
+                    f"Early stopping at epoch {epoch} (no val improvement for {patience} epochs)"
+                )
+                break
+
+            if epoch % 10 == 0:
+                logger.debug(
+                    f"{prefix}Epoch {epoch}: Training loss {loss:.6f}, Validation loss {val_loss:.6f}"
+                )
+            if log_every and epoch % log_every == 0:
+                log_message(
+                    f"{prefix}Epoch {epoch}, Loss: {loss:.4f}, Val Loss: {val_loss:.4f}, LR: {optimizer.learning_rate:.6f}"
+                )
+
+        # Restore best weights (self-healing)
+        if best_weights is not None:
+            logger.info(
+                "Restoring best model weights based on validation loss to avoid overfitting."
+            )
+            self.set_weights(best_weights)
+        return history
+
+
+def build_model(n_features, hidden_sizes, n_outputs=1, dtype=np.float64):
+    """Dense + ReLU for each hidden size, then a linear output layer."""
+    steps = []
+    for size in hidden_sizes:
+        steps += [Layer(n_features, size), ReLU()]
+        n_features = size
+    steps.append(Layer(n_features, n_outputs))
+    return Sequential(steps, dtype=dtype)
 
 
 # --- Utility Functions ---
@@ -219,38 +520,29 @@ if __name__ == "__main__":
     # 5. Using validation data to monitor overfitting.
     # 6. Dynamically adjusting learning rate and restoring best weights (self-healing).
     # 7. Visualizing predictions and trends.
+    parser = argparse.ArgumentParser(description="Train a small NumPy network on synthetic and real price data")
+    parser.add_argument("--hidden", type=int, nargs="+", default=[10], help="Hidden layer sizes (default: 10)")
+    parser.add_argument("--optimizer", choices=sorted(OPTIMIZERS), default="sgd", help="Optimizer (default: sgd)")
+    parser.add_argument("--learning-rate", type=float, default=0.001, help="Initial learning rate")
+    parser.add_argument("--batch-size", type=int, default=64, help="Mini-batch size for the real data")
+    parser.add_argument("--float32", action="store_true", help="Train in single precision")
+    args = parser.parse_args()
+    dtype = np.float32 if args.float32 else np.float64
+
     logger.info("=== Neural Network Training Exercise ===")
     logger.info("Step 1: Generating synthetic data for demonstration.")
     # Prepare data for training (synthetic)
     inputs = historical_prices.T  # shape: (features, samples)
     y = target_prices.reshape(1, -1)  # shape: (1, samples)
-    hidden_layer = Layer(inputs.shape[0], 10)
-    output_layer = Layer(10, 1)
-    learning_rate = 0.001
+    logger.info("Step 2: Building the network from the Layer and ReLU building blocks.")
+    model = build_model(inputs.shape[0], args.hidden, dtype=dtype)
 
     # Training loop for synthetic data
     logger.info("Step 3: Training on synthetic data (observe loss every 100 epochs).")
-    for epoch in range(1000):
-        hidden_output = hidden_layer.forward(inputs)
-        activation_output = relu(hidden_output)
-        output = output_layer.forward(activation_output)
-        loss = mse_loss(output, y)
-        loss_grad = mse_loss_derivative(output, y)
-        indirect_loss = output_layer.backward(
-            activation_output, loss_grad, learning_rate
-        )
-        hidden_output_grad = indirect_loss * relu_derivative(hidden_output)
-        hidden_layer.backward(inputs, hidden_output_grad, learning_rate)
-        if epoch % 100 == 0:
-            logger.info(f"[Synthetic] Epoch {epoch}, Loss: {loss:.4f}")
+    model.fit(inputs, y, OPTIMIZERS[args.optimizer](args.learning_rate), epochs=1000, batch_size=32, tag="[Synthetic]")
 
     logger.info("Step 4: Predicting on synthetic data and plotting results.")
-
-    def predict(x):
-        """Run forward pass for prediction."""
-        return output_layer.forward(relu(hidden_layer.forward(x)))
-
-    predictions = predict(inputs).flatten()
+    predictions = model.predict(inputs).flatten()
 
     # Plot actual vs predicted prices (synthetic)
     plt.figure(figsize=(10, 5))
@@ -295,9 +587,8 @@ if __name__ == "__main__":
     # Prepare data for training (real)
     inputs = historical_prices_norm.T
     y = target_prices_norm.T
-    hidden_layer = Layer(inputs.shape[0], 10)
-    output_layer = Layer(10, 1)
-    learning_rate = 0.001
+    model = build_model(inputs.shape[0], args.hidden, dtype=dtype)
+    optimizer = OPTIMIZERS[args.optimizer](args.learning_rate)
     min_learning_rate = 1e-6
     epochs = 70000
     patience = 10
@@ -309,7 +600,6 @@ if __name__ == "__main__":
         inputs[:, validation_index:],
     )
     train_y, val_y = y[:, :validation_index], y[:, validation_index:]
-    validation_losses = []
 
     logger.info(
         "Step 9: Starting training on real data with self-healing feedback loop."
@@ -318,91 +608,22 @@ if __name__ == "__main__":
     logger.info("  - Early stopping will occur if no improvement for several epochs.")
     logger.info("  - Best weights are restored at the end to avoid overfitting.")
 
-    # --- Self-healing feedback loop variables ---
-    best_val_loss = float("inf")
-    best_weights = None
-    best_biases = None
-    best_output_weights = None
-    best_output_biases = None
-    epochs_since_improvement = 0
-    epochs_since_lr_reduce = 0
-
-    for epoch in range(epochs):
-        # Forward pass
-        hidden_output = hidden_layer.forward(train_inputs)
-        activation_output = relu(hidden_output)
-        output = output_layer.forward(activation_output)
-        loss = mse_loss(output, train_y)
-        # Backward pass
-        loss_grad = mse_loss_derivative(output, train_y)
-        indirect_loss = output_layer.backward(
-            activation_output, loss_grad, learning_rate
-        )
-        hidden_output_grad = indirect_loss * relu_derivative(hidden_output)
-        hidden_layer.backward(train_inputs, hidden_output_grad, learning_rate)
-        # Validation loss
-        val_hidden_output = hidden_layer.forward(val_inputs)
-        val_activation_output = relu(val_hidden_output)
-        val_output = output_layer.forward(val_activation_output)
-        val_loss = mse_loss(val_output, val_y)
-        validation_losses.append(val_loss)
-
-        # --- Feedback loop: self-healing fine-tuning ---
-        if val_loss < best_val_loss - 1e-6:  # Significant improvement
-            best_val_loss = val_loss
-            # Save best weights and biases
-            best_weights = hidden_layer.weights.copy()
-            best_biases = hidden_layer.biases.copy()
-            best_output_weights = output_layer.weights.copy()
-            best_output_biases = output_layer.biases.copy()
-            epochs_since_improvement = 0
-            epochs_since_lr_reduce = 0
-        else:
-            epochs_since_improvement += 1
-            epochs_since_lr_reduce += 1
-
-        # Reduce learning rate if no improvement for lr_patience epochs
-        if epochs_since_lr_reduce >= lr_patience:
-            old_lr = learning_rate
-            learning_rate = max(learning_rate * 0.5, min_learning_rate)
-            logger.info(
-                f"Reducing learning rate from {old_lr:.6f} to {learning_rate:.6f} at epoch {epoch}"
-            )
-            epochs_since_lr_reduce = 0
-
-        # Early stopping if no improvement for 'patience' epochs
-        if epochs_since_improvement >= patience:
-            logger.info(
-                f"Early stopping at epoch {epoch} (no val improvement for {patience} epochs)"
-            )
-            break
-
-        if epoch % 10 == 0:
-            logger.debug(
-                f"Epoch {epoch}: Training loss {loss:.6f}, Validation loss {val_loss:.6f}"
-            )
-        if epoch % 100 == 0:
-            log_message(
-                f"Epoch {epoch}, Loss: {loss:.4f}, Val Loss: {val_loss:.4f}, LR: {learning_rate:.6f}"
-            )
-
-    # Restore best weights (self-healing)
-    if best_weights is not None:
-        logger.info(
-            "Restoring best model weights based on validation loss to avoid overfitting."
-        )
-        hidden_layer.weights = best_weights
-        hidden_layer.biases = best_biases
-        output_layer.weights = best_output_weights
-        output_layer.biases = best_output_biases
+    history = model.fit(
+        train_inputs,
+        train_y,
+        optimizer,
+        epochs,
+        batch_size=args.batch_size,
+        validation_data=(val_inputs, val_y),
+        patience=patience,
+        lr_patience=lr_patience,
+        min_learning_rate=min_learning_rate,
+    )
+    validation_losses = history["val_loss"]
 
     logger.info("Step 10: Predicting on all data and denormalizing predictions.")
 
-    def predict(x):
-        """Run forward pass for prediction."""
-        return output_layer.forward(relu(hidden_layer.forward(x)))
-
-    predictions_norm = predict(inputs).flatten()
+    predictions_norm = model.predict(inputs).flatten()
     predictions = denormalize(predictions_norm, mean_target, std_target)
 
     logger.info("Step 11: Predicting the next few days based on the last known input.")
@@ -411,7 +632,7 @@ if __name__ == "__main__":
     num_days = 5
     last_input = historical_prices_norm[-1].reshape(-1, 1)
     for _ in range(num_days):
-        next_day_prediction_norm = predict(last_input)
+        next_day_prediction_norm = model.predict(last_input)
         next_days_predictions_norm.append(next_day_prediction_norm.mean())
         # Roll input and append prediction for next step
         last_input = np.roll(last_input, -1)
@@ -50,12 +50,21 @@ without making any changes.
 
 import argparse
 import ast
-import importlib
+import difflib
+import hashlib
+import importlib.machinery
+import importlib.util
+import json
 import logging
 import os
+import pkgutil
+import subprocess
 import sys
+import tempfile
 from ast import NodeVisitor
-from typing import List, Set, Tuple
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 
 # These library imports will not be moved to the top of the module
 EXCLUDE_LIBS: Set[str] = {
@@ -68,6 +77,503 @@ EXCLUDE_FILES: Set[str] = {
     "__init__.py",
 }
 
+# Per-folder caches live here rather than in the scanned tree
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "optimize_imports")
+CACHE_FILE_NAME = "files.json"
+IMPORT_COST_CACHE_FILE_NAME = "import_costs.json"
+
+# Imports with a cumulative import time above this stay lazy in --profile-imports mode
+SLOW_IMPORT_MS = 20.0
+
+# Modules that --lazy-imports may turn into lazy module proxies
+LAZY_IMPORT_ALLOWLIST: Set[str] = {
+    "matplotlib.pyplot",
+    "numpy",
+    "pandas",
+    "PIL.Image",
+    "requests",
+    "scipy",
+    "tabulate",
+}
+# A module used in more functions than this is needed often enough to import eagerly
+LAZY_IMPORT_MAX_FUNCTIONS = 3
+
+LAZY_IMPORT_SHIM = '''import importlib.util
+import sys
+
+
+def _lazy_import(name):
+    """Return module `name`, deferring its import until an attribute is first used."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+'''
+
+
+def installed_packages_key(include_script_dir: bool = False) -> List[List]:
+    """Fingerprint the installed packages: each sys.path directory with its mtime.
+
+    Installing or removing a distribution adds or removes entries in its
+    site-packages directory, which changes the directory mtime. sys.path[0],
+    the directory of this script, is left out unless include_script_dir is
+    set, since it is not an install target.
+    """
+    key = []
+    for entry in sys.path if include_script_dir else sys.path[1:]:
+        try:
+            key.append([entry, os.stat(entry or ".").st_mtime_ns])
+        except OSError:
+            key.append([entry, None])
+    return key
+
+
+def default_cache_path(folder: str, file_name: str) -> str:
+    """Return the per-folder cache file `file_name` under DEFAULT_CACHE_DIR."""
+    digest = hashlib.sha256(os.path.abspath(folder).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(DEFAULT_CACHE_DIR, digest, file_name)
+
+
+class ModuleResolver:
+    """Decide whether a module can be imported without importing it.
+
+    Standard library modules are recognised from sys.stdlib_module_names.
+    Anything else is located with the import system's finders, walking package
+    search paths for dotted names, so no module code ever runs. Answers are
+    memoized per module name. With a cache path, the top-level names found on
+    sys.path are stored on disk and reused while sys.path is unchanged.
+    """
+
+    def __init__(self, cache_path: Optional[str] = None) -> None:
+        """Initialize the resolver.
+
+        Args:
+            cache_path: Optional JSON file for the installed top-level module map
+
+        """
+        self._memo: Dict[str, bool] = {}
+        self._top_level: Optional[Set[str]] = self._load_top_level(cache_path) if cache_path else None
+
+    def _load_top_level(self, cache_path: str) -> Set[str]:
+        """Return every importable top-level module name, from the cache when it is current."""
+        # Modules next to this script are importable too, so its directory counts here
+        key = installed_packages_key(include_script_dir=True)
+        try:
+            with open(cache_path, encoding="utf-8") as fd:
+                data = json.load(fd)
+            if data.get("key") == key:
+                return set(data["modules"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+        modules = set(sys.builtin_module_names)
+        modules.update(module.name for module in pkgutil.iter_modules(sys.path))
+        try:
+            tmp_path = f"{cache_path}.tmp"
+            with open(tmp_path, encoding="utf-8", mode="w") as fd:
+                json.dump({"key": key, "modules": sorted(modules)}, fd)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logging.warning(f"Could not write module cache {cache_path}: {e}")
+        return modules
+
+    def _find_top_level(self, name: str) -> Optional[importlib.machinery.ModuleSpec]:
+        try:
+            return importlib.util.find_spec(name)
+        except (ImportError, ValueError):
+            return None
+
+    def is_resolvable(self, module: str) -> bool:
+        """Return True if `module` would be found by an import statement."""
+        resolved = self._memo.get(module)
+        if resolved is None:
+            resolved = self._memo[module] = self._resolve(module)
+        return resolved
+
+    def _resolve(self, module: str) -> bool:
+        parts = module.split(".")
+        top = parts[0]
+        if top in sys.stdlib_module_names:
+            # Standard library submodules such as os.path are not always real files
+            return True
+        if len(parts) == 1 and self._top_level is not None:
+            return top in self._top_level
+
+        spec = self._find_top_level(top)
+        for depth in range(1, len(parts)):
+            if spec is None or spec.submodule_search_locations is None:
+                return False
+            # PathFinder only looks in the given directories; it never imports the parent package
+            spec = importlib.machinery.PathFinder.find_spec(".".join(parts[:depth + 1]), list(spec.submodule_search_locations))
+        return spec is not None
+
+
+RESOLVER = ModuleResolver()
+
+
+def configure_resolver(cache_path: Optional[str]) -> None:
+    """Replace the module resolver, e.g. to use an on-disk module map (also used as a pool initializer)."""
+    global RESOLVER  # pylint: disable=global-statement
+    RESOLVER = ModuleResolver(cache_path)
+
+
+class ImportCostProfiler:
+    """Measure how long modules take to import using `python -X importtime`.
+
+    Each module is imported once in a fresh interpreter and its cumulative
+    import time (the module plus everything it pulls in) is read from the
+    importtime report on stderr. Costs are memoized and, with a cache path,
+    stored on disk for as long as the interpreter binary is unchanged.
+    """
+
+    def __init__(self, cache_path: Optional[str] = None, slow_ms: float = SLOW_IMPORT_MS, python: str = sys.executable) -> None:
+        """Initialize the profiler.
+
+        Args:
+            cache_path: Optional JSON file for measured costs
+            slow_ms: Cumulative import time above which an import is considered slow
+            python: Interpreter used to measure imports
+
+        """
+        self.cache_path = cache_path
+        self.slow_ms = slow_ms
+        self.python = python
+        try:
+            self.key = [python, os.stat(python).st_mtime_ns]
+        except OSError:
+            self.key = [python, None]
+        self.costs: Dict[str, Optional[float]] = {}
+        self._baseline: Optional[Set[str]] = None
+        self._load()
+
+    def _load(self) -> None:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, encoding="utf-8") as fd:
+                data = json.load(fd)
+        except (OSError, ValueError):
+            return
+        if data.get("key") == self.key:
+            self.costs.update(data.get("costs", {}))
+
+    def _save(self) -> None:
+        if not self.cache_path:
+            return
+        # Workers share the cache file, so merge with what is there and replace it atomically
+        self._load()
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.cache_path)), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp:
+            json.dump({"key": self.key, "costs": self.costs}, tmp)
+        os.replace(tmp_path, self.cache_path)
+
+    def _run_importtime(self, code: str) -> Optional[Dict[str, int]]:
+        """Run `code` under -X importtime and return {top-level module: cumulative us}."""
+        try:
+            result = subprocess.run(
+                [self.python, "-X", "importtime", "-c", code],
+                capture_output=True,
+                text=True,
+                timeout=120,
+                check=False,
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logging.warning(f"Could not profile {code!r}: {e}")
+            return None
+        if result.returncode != 0:
+            return None
+
+        # Lines look like "import time:   self [us] | cumulative | imported package",
+        # with nested imports indented under the module that triggered them
+        top_level = {}
+        for line in result.stderr.splitlines():
+            fields = line.split("|")
+            if not line.startswith("import time:") or len(fields) != 3:
+                continue
+            name = fields[2][1:]
+            if name and not name.startswith(" ") and fields[1].strip().isdigit():
+                top_level[name] = int(fields[1])
+        return top_level
+
+    def measure(self, module: str) -> Optional[float]:
+        """Import `module` in a fresh interpreter and return its cumulative import time in ms.
+
+        The cost covers every module the import loads beyond what the
+        interpreter loads at startup (so "import a.b" includes package "a").
+        Returns None if the import fails.
+        """
+        if self._baseline is None:
+            self._baseline = set(self._run_importtime("pass") or ())
+        top_level = self._run_importtime(f"import {module}")
+        if top_level is None:
+            return None
+        return sum(cost for name, cost in top_level.items() if name not in self._baseline) / 1000.0
+
+    def cost_ms(self, module: str) -> Optional[float]:
+        """Return the memoized cumulative import time of `module` in ms."""
+        if module not in self.costs:
+            self.costs[module] = self.measure(module)
+            self._save()
+        return self.costs[module]
+
+    def is_slow(self, module: str) -> bool:
+        """Return True if `module` should stay lazy: it is slow to import or fails to import."""
+        cost = self.cost_ms(module)
+        return cost is None or cost > self.slow_ms
+
+
+PROFILER: Optional[ImportCostProfiler] = None
+
+
+def configure_profiler(cache_path: Optional[str], slow_ms: float = SLOW_IMPORT_MS) -> None:
+    """Enable import cost profiling for process_file."""
+    global PROFILER  # pylint: disable=global-statement
+    PROFILER = ImportCostProfiler(cache_path, slow_ms)
+
+
+class _NameUseVisitor(NodeVisitor):
+    """Record, for each name, the outermost functions that read it and whether module-level code does."""
+
+    def __init__(self, names: Set[str], postponed_annotations: bool = False) -> None:
+        self.names = names
+        self.postponed_annotations = postponed_annotations
+        self.function_stack: List[ast.AST] = []
+        self.functions: Dict[str, Set[int]] = {name: set() for name in names}
+        self.module_level: Set[str] = set()
+        self.rebound: Set[str] = set()
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
+        # Decorators, defaults and annotations run when the def statement does
+        exprs = [*node.decorator_list, *node.args.defaults, *node.args.kw_defaults]
+        if not self.postponed_annotations:
+            args = node.args
+            params = [*args.posonlyargs, *args.args, *args.kwonlyargs, args.vararg, args.kwarg]
+            exprs.extend(param.annotation for param in params if param is not None)
+            exprs.append(node.returns)
+        for expr in exprs:
+            if expr is not None:
+                self.visit(expr)
+        self.function_stack.append(node)
+        for stmt in node.body:
+            self.visit(stmt)
+        self.function_stack.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if node.id not in self.names:
+            return
+        if not isinstance(node.ctx, ast.Load):
+            self.rebound.add(node.id)
+        elif self.function_stack:
+            self.functions[node.id].add(id(self.function_stack[0]))
+        else:
+            self.module_level.add(node.id)
+
+
+class LazyImportRewriter:
+    """Turn heavy top-level `import x [as y]` statements into lazy module proxies.
+
+    This is the reverse of the normal mode: an allowlisted module that is only
+    used inside a few functions is bound to `_lazy_import("x")`, a
+    importlib.util.LazyLoader shim added to the file, so the real import only
+    happens when one of those functions first touches the module. Modules used
+    by module-level code are left alone, since that code would trigger the
+    import at startup anyway.
+    """
+
+    def __init__(self, allowlist: Set[str], max_functions: int = LAZY_IMPORT_MAX_FUNCTIONS) -> None:
+        """Initialize the rewriter.
+
+        Args:
+            allowlist: Modules that may be made lazy
+            max_functions: Most functions a module may be used in and still be made lazy
+
+        """
+        self.allowlist = set(allowlist)
+        self.max_functions = max_functions
+
+    def _candidates(self, tree: ast.Module) -> Dict[str, Tuple[ast.Import, str]]:
+        """Return {bound name: (import node, module)} for allowlisted top-level imports."""
+        line_owners = Counter()
+        for stmt in tree.body:
+            for line_number in range(stmt.lineno, stmt.end_lineno + 1):
+                line_owners[line_number] += 1
+
+        candidates: Dict[str, Tuple[ast.Import, str]] = {}
+        for stmt in tree.body:
+            if not isinstance(stmt, ast.Import):
+                continue
+            if any(line_owners[n] > 1 for n in range(stmt.lineno, stmt.end_lineno + 1)):
+                # Shares a line with another statement ("import x; y = 1"), leave it alone
+                continue
+            for alias in stmt.names:
+                if alias.name not in self.allowlist:
+                    continue
+                if "." in alias.name and not alias.asname:
+                    # "import a.b" binds "a", which a proxy for "a.b" cannot stand in for
+                    continue
+                candidates[alias.asname or alias.name] = (stmt, alias.name)
+        return candidates
+
+    @staticmethod
+    def _insert_at_anchor(content_lines: List[str], anchor: int, add_shim: bool, after_def: bool, bindings: List[str]) -> None:
+        """Insert the shim (when missing) and the lazy bindings after line `anchor`, two blank lines from any def."""
+        chunk = LAZY_IMPORT_SHIM.rstrip("\n").split("\n") if add_shim else []
+        after_def = after_def or add_shim
+        if bindings:
+            chunk += (["", ""] if after_def else []) + bindings
+            after_def = False
+        if not chunk:
+            return
+        end = anchor
+        if after_def:
+            # The chunk ends with the shim's def, so whatever follows needs exactly two blank lines
+            while end < len(content_lines) and not content_lines[end].strip():
+                end += 1
+            if end < len(content_lines):
+                chunk += ["", ""]
+        content_lines[anchor:end] = chunk
+
+    def rewrite_file(self, file_path: str, dry_run: bool = False) -> int:
+        """Rewrite one file, or only log the diff in dry-run mode.
+
+        Returns:
+            Integer return code (0 = nothing to change, 1 = imports made lazy)
+
+        """
+        logging.debug(f"Processing file: {file_path}")
+
+        with open(file_path, encoding="utf-8") as fd:
+            content = fd.read()
+
+        tree = ast.parse(content)
+        content_lines = content.split("\n")
+        candidates = self._candidates(tree)
+        if not candidates:
+            logging.debug(f"No lazy import candidates in {file_path}")
+            return 0
+
+        postponed = any(
+            isinstance(stmt, ast.ImportFrom) and stmt.module == "__future__" and any(alias.name == "annotations" for alias in stmt.names)
+            for stmt in tree.body
+        )
+        uses = _NameUseVisitor(set(candidates), postponed)
+        for stmt in tree.body:
+            if isinstance(stmt, ast.Import):
+                continue
+            uses.visit(stmt)
+
+        lazy: Dict[str, str] = {}
+        for name, (_, module_name) in candidates.items():
+            function_count = len(uses.functions[name])
+            if name in uses.module_level or name in uses.rebound:
+                logging.debug(f"{file_path}: '{module_name}' is used at module level, keeping it eager")
+            elif function_count == 0 or function_count > self.max_functions:
+                logging.debug(f"{file_path}: '{module_name}' is used in {function_count} functions, keeping it eager")
+            else:
+                lazy[name] = module_name
+                logging.info(f"{file_path}: '{module_name}' is only used in {function_count} function(s), making it lazy")
+
+        if not lazy:
+            return 0
+
+        # The shim and the lazy bindings go right after the file's leading import
+        # block (or after an existing shim), so no eager import ends up below a def
+        shim = next((stmt for stmt in tree.body if isinstance(stmt, ast.FunctionDef) and stmt.name == "_lazy_import"), None)
+        after_def = shim is not None
+        if shim is not None:
+            # After the shim and the bindings a previous run put below it
+            anchor = shim.end_lineno
+            for stmt in tree.body[tree.body.index(shim) + 1:]:
+                call = stmt.value if isinstance(stmt, ast.Assign) else None
+                if not (isinstance(call, ast.Call) and isinstance(call.func, ast.Name) and call.func.id == "_lazy_import"):
+                    break
+                anchor = stmt.end_lineno
+                after_def = False
+        else:
+            anchor = 0
+            for index, stmt in enumerate(tree.body):
+                if isinstance(stmt, (ast.Import, ast.ImportFrom)):
+                    anchor = stmt.end_lineno
+                elif not (index == 0 and isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant) and isinstance(stmt.value.value, str)):
+                    break
+
+        # Work out the replacement for each affected import statement
+        statements = sorted({id(stmt): stmt for stmt, _ in candidates.values()}.values(), key=lambda stmt: stmt.lineno)
+        replacements = []
+        bindings: List[str] = []
+        for stmt in statements:
+            kept = [alias for alias in stmt.names if (alias.asname or alias.name) not in lazy]
+            made_lazy = [alias for alias in stmt.names if (alias.asname or alias.name) in lazy]
+            if not made_lazy:
+                continue
+            new_lines = []
+            if kept:
+                new_lines.append("import " + ", ".join(f"{a.name} as {a.asname}" if a.asname else a.name for a in kept))
+            lazy_lines = [f'{alias.asname or alias.name} = _lazy_import("{alias.name}")' for alias in made_lazy]
+            if stmt.end_lineno <= anchor:
+                # Bound below the shim, which is not defined yet at this point
+                bindings.extend(lazy_lines)
+            else:
+                new_lines.extend(lazy_lines)
+            replacements.append((stmt, new_lines))
+
+        # Apply them bottom-up so line numbers stay valid, adding the shim once
+        # every statement below the anchor is done
+        inserted = False
+        for stmt, new_lines in reversed(replacements):
+            if stmt.end_lineno <= anchor and not inserted:
+                self._insert_at_anchor(content_lines, anchor, shim is None, after_def, bindings)
+                inserted = True
+            content_lines[stmt.lineno - 1:stmt.end_lineno] = new_lines
+        if not inserted:
+            self._insert_at_anchor(content_lines, anchor, shim is None, after_def, bindings)
+
+        new_content = "\n".join(content_lines)
+        diff = difflib.unified_diff(content.splitlines(), new_content.splitlines(), file_path, file_path, lineterm="")
+        logging.info("\n".join(diff))
+
+        if dry_run:
+            logging.info("Dry run: No changes made to the file")
+            return 1
+
+        with open(file_path, encoding="utf-8", mode="w") as fd:
+            fd.write(new_content)
+        logging.info(f"Updated file: {file_path}")
+        return 1
+
+
+LAZY_REWRITER: Optional[LazyImportRewriter] = None
+
+
+def configure_lazy_imports(allowlist: Set[str], max_functions: int = LAZY_IMPORT_MAX_FUNCTIONS) -> None:
+    """Switch process_file to the lazy-import rewrite."""
+    global LAZY_REWRITER  # pylint: disable=global-statement
+    LAZY_REWRITER = LazyImportRewriter(allowlist, max_functions)
+
+
+def _init_worker(
+    module_cache: Optional[str],
+    profiler_settings: Optional[Tuple[Optional[str], float]],
+    lazy_settings: Optional[Tuple[Set[str], int]] = None,
+) -> None:
+    """Process pool initializer: set up the resolver, profiler and rewriter like the parent's."""
+    configure_resolver(module_cache)
+    if profiler_settings is not None:
+        configure_profiler(*profiler_settings)
+    if lazy_settings is not None:
+        configure_lazy_imports(*lazy_settings)
+
 
 def setup_logging(verbose: bool = False) -> None:
     """Configure logging based on verbosity level.
@@ -82,7 +588,11 @@ def setup_logging(verbose: bool = False) -> None:
 
 
 class ImportVisitor(NodeVisitor):
-    """Visitor to find import statements inside function definitions."""
+    """Visitor to find import statements inside function definitions.
+
+    The tree is traversed once; the enclosing functions are kept on a stack so
+    every import is seen exactly once, however deeply functions are nested.
+    """
 
     def __init__(self, file_path: str) -> None:
         """Initialize the visitor.
@@ -94,21 +604,31 @@ class ImportVisitor(NodeVisitor):
         self.ret = 0  # Return code (0 = success, 1 = issues found)
         self.file_path = file_path
         self.line_numbers: List[int] = []
-        self.imports_found: List[Tuple[int, str, str]] = []  # line_number, import_name, full_line
+        self.imports_found: List[Tuple[int, List[str], str]] = []  # line_number, module names, full_line
+        self.function_stack: List[str] = []  # names of the enclosing functions
 
     def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
-        """Visit a function definition and look for imports inside it."""
-        for sub_node in ast.walk(node):
-            if self._is_movable_import_from(sub_node):
-                self._process_import_from(sub_node)
-            elif self._is_movable_import(sub_node):
-                self._process_import(sub_node)
-
+        """Visit a function or method definition, tracking it as the current scope."""
+        self.function_stack.append(node.name)
         self.generic_visit(node)
+        self.function_stack.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Import(self, node: ast.Import) -> None:
+        """Record an Import found inside a function."""
+        if self.function_stack and self._is_movable_import(node):
+            self._process_import(node)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        """Record an ImportFrom found inside a function."""
+        if self.function_stack and self._is_movable_import_from(node):
+            self._process_import_from(node)
 
     def _is_movable_import_from(self, node: ast.AST) -> bool:
         """Check if the node is an ImportFrom that should be moved."""
-        return isinstance(node, ast.ImportFrom) and node.module != "__main__" and node.module not in EXCLUDE_LIBS and node.module.split(".")[0] not in EXCLUDE_LIBS
+        # Relative imports ("from . import x") only make sense inside their package
+        return isinstance(node, ast.ImportFrom) and node.level == 0 and node.module != "__main__" and node.module not in EXCLUDE_LIBS and node.module.split(".")[0] not in EXCLUDE_LIBS
 
     def _is_movable_import(self, node: ast.AST) -> bool:
         """Check if the node is an Import that should be moved."""
@@ -116,56 +636,63 @@ class ImportVisitor(NodeVisitor):
 
     def _process_import_from(self, node: ast.ImportFrom) -> None:
         """Process an ImportFrom node to determine if it should be moved."""
-        try:
-            importlib.import_module(node.module)
-        except Exception:
-            # If the module can't be imported, it's probably not a standard library
-            pass
-        else:
+        # If the module can't be resolved, it's probably not a standard library
+        if RESOLVER.is_resolvable(node.module):
             message = f"{self.file_path}:{node.lineno}:{node.col_offset} {node.end_lineno} standard library import '{node.module}' should be at the top of the file"
             logging.info(message)
 
             # Store import information for later use
             import_stmt = f"from {node.module} import {', '.join(n.name for n in node.names)}"
-            self.imports_found.append((node.lineno, node.module, import_stmt))
+            self.imports_found.append((node.lineno, [node.module], import_stmt))
 
             self.ret = 1
             self.line_numbers.append(node.lineno)
 
     def _process_import(self, node: ast.Import) -> None:
-        """Process an Import node to determine if it should be moved."""
-        for name in node.names:
-            if name.name == "__main__" or name.name in EXCLUDE_LIBS or name.name.split(".")[0] in EXCLUDE_LIBS:
-                continue
+        """Process an Import node to determine if it should be moved.
 
-            try:
-                importlib.import_module(name.name)
-            except Exception:
-                # If the module can't be imported, it's probably not a standard library
-                pass
-            else:
-                message = f"{self.file_path}:{node.lineno}:{node.col_offset} standard library import '{name.name}' should be at the top of the file"
-                logging.info(message)
+        The whole line is moved, so an "import a, b" statement is recorded once
+        and only when every module in it can be moved.
+        """
+        modules = [name.name for name in node.names]
+        for module in modules:
+            if module == "__main__" or module in EXCLUDE_LIBS or module.split(".")[0] in EXCLUDE_LIBS:
+                return
+            # If the module can't be resolved, it's probably not a standard library
+            if not RESOLVER.is_resolvable(module):
+                return
 
-                # Store import information for later use
-                import_stmt = f"import {name.name}"
-                self.imports_found.append((node.lineno, name.name, import_stmt))
+        message = f"{self.file_path}:{node.lineno}:{node.col_offset} standard library import {', '.join(repr(m) for m in modules)} should be at the top of the file"
+        logging.info(message)
 
-                self.ret = 1
-                self.line_numbers.append(node.lineno)
+        # Store import information for later use
+        import_stmt = f"import {', '.join(modules)}"
+        self.imports_found.append((node.lineno, modules, import_stmt))
 
+        self.ret = 1
+        self.line_numbers.append(node.lineno)
 
-def process_file(file_path: str, dry_run: bool = False) -> int:
+
+def process_file(file_path: str, dry_run: bool = False, import_costs: Optional[Dict[str, Optional[float]]] = None) -> int:
     """Process a single Python file.
 
+    When import profiling is enabled, imports that are slow to load are left
+    inside their functions and only cheap ones are moved. When lazy imports
+    are configured the file is handed to the LazyImportRewriter instead.
+
     Args:
         file_path: Path to the file to process
         dry_run: If True, don't modify files, just report what would change
+        import_costs: If given and profiling is enabled, filled with the
+            cumulative import time (ms) of every candidate module
 
     Returns:
         Integer return code (0 = success, 1 = issues found)
 
     """
+    if LAZY_REWRITER is not None:
+        return LAZY_REWRITER.rewrite_file(file_path, dry_run)
+
     logging.debug(f"Processing file: {file_path}")
 
     with open(file_path, encoding="utf-8") as fd:
@@ -175,13 +702,30 @@ def process_file(file_path: str, dry_run: bool = False) -> int:
     visitor = ImportVisitor(file_path)
     visitor.visit(tree)
 
+    if PROFILER is not None and visitor.line_numbers:
+        lazy_lines = set()
+        for line_number, module_names, _ in visitor.imports_found:
+            for module_name in module_names:
+                cost = PROFILER.cost_ms(module_name)
+                if import_costs is not None:
+                    import_costs[module_name] = cost
+                if PROFILER.is_slow(module_name):
+                    # The statement moves as a whole, so one slow module keeps all of it lazy
+                    lazy_lines.add(line_number)
+                    reason = "import fails" if cost is None else f"{cost:.1f} ms"
+                    logging.info(f"{file_path}:{line_number} keeping lazy import '{module_name}' ({reason})")
+
+        visitor.line_numbers = [n for n in visitor.line_numbers if n not in lazy_lines]
+        visitor.imports_found = [found for found in visitor.imports_found if found[0] not in lazy_lines]
+        visitor.ret = 1 if visitor.line_numbers else 0
+
     if visitor.line_numbers:
         logging.info(f"Found {len(visitor.line_numbers)} imports to move in {file_path}")
 
         # Sort imports by module name for better organization
         visitor.imports_found.sort(key=lambda x: x[1])
 
-        for _, module_name, import_stmt in visitor.imports_found:
+        for _, _, import_stmt in visitor.imports_found:
             logging.info(f"  Will move: {import_stmt}")
 
         if dry_run:
@@ -212,6 +756,147 @@ def process_file(file_path: str, dry_run: bool = False) -> int:
     return visitor.ret
 
 
+class _RecordCollector(logging.Handler):
+    """Logging handler that keeps records so a worker can hand them back to the parent."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: List[Tuple[int, str]] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append((record.levelno, record.getMessage()))
+
+
+def _process_file_captured(job: Tuple[str, bool, int]) -> Tuple[int, List[Tuple[int, str]], Dict[str, Optional[float]]]:
+    """Run process_file in a worker process and return its result and log records.
+
+    Args:
+        job: (file_path, dry_run, log_level) tuple
+
+    Returns:
+        Tuple of the return code, the (level, message) records it logged and
+        the import costs it measured
+
+    """
+    file_path, dry_run, log_level = job
+    root = logging.getLogger()
+    collector = _RecordCollector()
+    root.handlers = [collector]
+    root.setLevel(log_level)
+
+    import_costs: Dict[str, Optional[float]] = {}
+    ret = process_file(file_path, dry_run, import_costs)
+    return ret, collector.records, import_costs
+
+
+def iter_python_files(folder: str) -> Iterator[str]:
+    """Yield the Python files under folder in os.walk order, skipping EXCLUDE_FILES."""
+    for subdir, _, files in os.walk(folder):
+        for file_ in files:
+            if file_.endswith(".py") and file_ not in EXCLUDE_FILES:
+                yield os.path.join(subdir, file_)
+
+
+def run_files(file_paths: List[str], dry_run: bool, jobs: int, module_cache: Optional[str] = None) -> Iterator[Tuple[str, int, Dict[str, Optional[float]]]]:
+    """Process files serially or in a process pool, in file order.
+
+    Yields (path, return code, import costs) tuples; the costs are only
+    filled in when import profiling is enabled.
+
+    Worker log output is replayed in the parent so it comes out in file order
+    rather than interleaved between processes.
+
+    Args:
+        file_paths: Files to process
+        dry_run: If True, don't modify files, just report what would change
+        jobs: Number of worker processes, 1 to run in this process
+        module_cache: Module map cache file handed to each worker's resolver
+
+    """
+    if jobs <= 1 or len(file_paths) <= 1:
+        for file_path in file_paths:
+            import_costs: Dict[str, Optional[float]] = {}
+            yield file_path, process_file(file_path, dry_run, import_costs), import_costs
+        return
+
+    log_level = logging.getLogger().getEffectiveLevel()
+    chunksize = max(1, len(file_paths) // (jobs * 8))
+    jobs_args = [(file_path, dry_run, log_level) for file_path in file_paths]
+    profiler_settings = (PROFILER.cache_path, PROFILER.slow_ms) if PROFILER is not None else None
+    lazy_settings = (LAZY_REWRITER.allowlist, LAZY_REWRITER.max_functions) if LAZY_REWRITER is not None else None
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(module_cache, profiler_settings, lazy_settings)) as executor:
+        for file_path, (ret, records, import_costs) in zip(file_paths, executor.map(_process_file_captured, jobs_args, chunksize=chunksize)):
+            for level, message in records:
+                logging.log(level, message)
+            yield file_path, ret, import_costs
+
+
+def log_import_cost_report(import_costs: Dict[str, Optional[float]], import_counts: Counter, slow_ms: float) -> None:
+    """Log the function-level imports ranked by their cumulative import time."""
+    if not import_costs:
+        return
+    logging.info("Import cost report (cumulative import time, most expensive first):")
+    ranked = sorted(import_costs.items(), key=lambda item: -1.0 if item[1] is None else item[1], reverse=True)
+    for module_name, cost in ranked:
+        if cost is None:
+            cost_text, action = "   failed", "keep lazy"
+        else:
+            cost_text, action = f"{cost:9.1f}", "keep lazy" if cost > slow_ms else "hoist"
+        logging.info(f"  {cost_text} ms  {module_name}  ({import_counts[module_name]} imports, {action})")
+
+
+class FileCache:
+    """Persistent record of files that had nothing to move, keyed on path, mtime and size.
+
+    With import profiling, the costs of the imports a clean file kept lazy are
+    stored alongside, so skipped files still show up in the import cost report.
+    The cache is dropped wholesale when the tool configuration, the analysis
+    settings, the Python interpreter or the installed packages change, since
+    any of them can change the analysis result.
+    """
+
+    def __init__(self, cache_path: Optional[str], settings: Optional[List[Any]] = None) -> None:
+        self.cache_path = cache_path
+        self.key = json.dumps([sys.version, sys.executable, installed_packages_key(), sorted(EXCLUDE_LIBS), settings])
+        self.files: Dict[str, List[Any]] = {}
+
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, encoding="utf-8") as fd:
+                    data = json.load(fd)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable cache {cache_path}: {e}")
+            else:
+                if data.get("key") == self.key:
+                    self.files = data.get("files", {})
+
+    @staticmethod
+    def _signature(file_path: str) -> List[int]:
+        stat = os.stat(file_path)
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def is_clean(self, file_path: str) -> bool:
+        """Return True if the file is unchanged since it was last found clean."""
+        entry = self.files.get(os.path.abspath(file_path))
+        return entry is not None and entry[:2] == self._signature(file_path)
+
+    def import_costs(self, file_path: str) -> Dict[str, Optional[float]]:
+        """Return the import costs recorded when the file was last found clean."""
+        return self.files[os.path.abspath(file_path)][2]
+
+    def mark_clean(self, file_path: str, import_costs: Optional[Dict[str, Optional[float]]] = None) -> None:
+        self.files[os.path.abspath(file_path)] = self._signature(file_path) + [import_costs or {}]
+
+    def save(self) -> None:
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, encoding="utf-8", mode="w") as fd:
+            json.dump({"key": self.key, "files": self.files}, fd)
+        os.replace(tmp_path, self.cache_path)
+
+
 def main() -> int:
     """Main entry point.
 
@@ -235,6 +920,58 @@ def main() -> int:
         action="store_true",
         help="Enable verbose logging",
     )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of worker processes (0 = one per CPU)",
+    )
+    parser.add_argument(
+        "--cache",
+        help=f"Cache file for skipping unchanged files (default: a per-folder file under {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--module-cache",
+        help="Cache file for the map of installed top-level modules",
+    )
+    parser.add_argument(
+        "--profile-imports",
+        action="store_true",
+        help="Measure import times with 'python -X importtime', keep slow imports lazy and report the most expensive ones",
+    )
+    parser.add_argument(
+        "--slow-import-ms",
+        type=float,
+        default=SLOW_IMPORT_MS,
+        help=f"Cumulative import time above which an import stays lazy (default: {SLOW_IMPORT_MS})",
+    )
+    parser.add_argument(
+        "--import-cost-cache",
+        help=f"Cache file for measured import times (default: a per-folder file under {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--lazy-imports",
+        action="store_true",
+        help="Reverse mode: turn allowlisted top-level imports used in only a few functions into lazy module proxies",
+    )
+    parser.add_argument(
+        "--lazy-allow",
+        action="append",
+        metavar="MODULE",
+        help="Module that --lazy-imports may make lazy (repeatable, replaces the built-in allowlist)",
+    )
+    parser.add_argument(
+        "--lazy-max-functions",
+        type=int,
+        default=LAZY_IMPORT_MAX_FUNCTIONS,
+        help=f"Most functions a module may be used in and still be made lazy (default: {LAZY_IMPORT_MAX_FUNCTIONS})",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Process every file, ignoring and not updating the cache",
+    )
     parser.add_argument(
         "--quiet",
         "-q",
@@ -253,27 +990,56 @@ def main() -> int:
     if args.dry_run:
         logging.info("Running in dry-run mode - no files will be modified")
 
+    jobs = args.jobs or os.cpu_count() or 1
+    if args.module_cache:
+        configure_resolver(args.module_cache)
+    if args.profile_imports:
+        cost_cache = None if args.no_cache else args.import_cost_cache or default_cache_path(args.folder, IMPORT_COST_CACHE_FILE_NAME)
+        configure_profiler(cost_cache, args.slow_import_ms)
+    settings = [args.slow_import_ms] if args.profile_imports else None
+    if args.lazy_imports:
+        allowlist = set(args.lazy_allow) if args.lazy_allow else LAZY_IMPORT_ALLOWLIST
+        configure_lazy_imports(allowlist, args.lazy_max_functions)
+        settings = ["lazy", sorted(allowlist), args.lazy_max_functions]
+    cache = FileCache(None if args.no_cache else args.cache or default_cache_path(args.folder, CACHE_FILE_NAME), settings)
+
     ret = 0
-    files_processed = 0
     files_with_issues = 0
+    import_costs: Dict[str, Optional[float]] = {}
+    import_counts: Counter = Counter()
 
-    for subdir, _, files in os.walk(args.folder):
-        for file_ in files:
-            if not file_.endswith(".py") or file_ in EXCLUDE_FILES:
-                continue
-
-            file_path = os.path.join(subdir, file_)
-            files_processed += 1
+    file_paths = list(iter_python_files(args.folder))
+    pending = []
+    for file_path in file_paths:
+        if cache.is_clean(file_path):
+            # Slow imports kept lazy in a clean file still belong in the report
+            file_costs = cache.import_costs(file_path)
+            import_costs.update(file_costs)
+            import_counts.update(file_costs.keys())
+        else:
+            pending.append(file_path)
+    files_processed = len(pending)
 
-            file_ret = process_file(file_path, args.dry_run)
+    try:
+        for file_path, file_ret, file_costs in run_files(pending, args.dry_run, jobs, args.module_cache):
             ret |= file_ret
+            import_costs.update(file_costs)
+            import_counts.update(file_costs.keys())
 
             if file_ret:
                 files_with_issues += 1
+            else:
+                cache.mark_clean(file_path, file_costs)
+    finally:
+        cache.save()
 
     # Summary at the end
     logging.info(f"Summary: Processed {files_processed} Python files")
+    if len(file_paths) > files_processed:
+        logging.info(f"Skipped {len(file_paths) - files_processed} unchanged files found clean on a previous run")
     logging.info(f"Found issues in {files_with_issues} files")
+    if args.profile_imports:
+        log_import_cost_report(import_costs, import_counts, args.slow_import_ms)
 
     if args.dry_run and files_with_issues > 0:
         logging.info("Re-run without --dry-run to apply the changes")
@@ -0,0 +1,107 @@
+"""Benchmark for the optimize_imports visitor.
+
+Compares the single-pass ImportVisitor with the previous visitor, which ran
+ast.walk over every function and then visited its children again, so nested
+functions were re-walked at every level and their imports reported repeatedly.
+
+The synthetic module has many top-level functions, each with a chain of nested
+functions (and async functions and methods) holding imports.
+
+Usage:
+    python optimize_imports_bench.py --functions 2000 --depth 8
+"""
+
+# -*- coding: utf-8 -*-
+# pylint: disable=C0116, W1203, C0103, C0301
+
+import argparse
+import ast
+import logging
+import time
+from typing import List
+
+from tabulate import tabulate
+
+from optimize_imports import ImportVisitor
+
+
+class NestedWalkImportVisitor(ImportVisitor):
+    """The previous visitor: ast.walk per function followed by generic_visit."""
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
+        for sub_node in ast.walk(node):
+            if self._is_movable_import_from(sub_node):
+                self._process_import_from(sub_node)
+            elif self._is_movable_import(sub_node):
+                self._process_import(sub_node)
+
+        self.generic_visit(node)
+
+    # The previous visitor only looked inside plain functions
+    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> None:
+        self.generic_visit(node)
+
+    def visit_Import(self, node: ast.Import) -> None:
+        pass
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        pass
+
+
+def make_source(functions: int, depth: int) -> str:
+    """Build a module with `functions` top-level functions nested `depth` levels deep."""
+    lines: List[str] = []
+    for i in range(functions):
+        indent = ""
+        for level in range(depth):
+            keyword = "async def" if level % 3 == 2 else "def"
+            lines.append(f"{indent}{keyword} func_{i}_{level}():")
+            indent += "    "
+            lines.append(f"{indent}import json")
+            lines.append(f"{indent}from os import path")
+        lines.append(f"{indent}return json, path")
+        lines.append("")
+        lines.append(f"class Class_{i}:")
+        lines.append("    def method(self):")
+        lines.append("        import collections")
+        lines.append("        return collections")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def run(visitor_cls, tree: ast.AST, repeat: int) -> dict:
+    best = float("inf")
+    visitor = None
+    for _ in range(repeat):
+        visitor = visitor_cls("<synthetic>")
+        started = time.perf_counter()
+        visitor.visit(tree)
+        best = min(best, time.perf_counter() - started)
+    return {
+        "visitor": visitor_cls.__name__,
+        "seconds": round(best, 4),
+        "imports reported": len(visitor.line_numbers),
+        "distinct lines": len(set(visitor.line_numbers)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the optimize_imports visitors on a synthetic file")
+    parser.add_argument("--functions", type=int, default=2000, help="Number of top-level functions")
+    parser.add_argument("--depth", type=int, default=8, help="Nesting depth of each function")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per visitor; the best time is kept")
+    args = parser.parse_args()
+
+    # Each reported import is logged at INFO, which would dominate the timings
+    logging.basicConfig(level=logging.WARNING)
+
+    source = make_source(args.functions, args.depth)
+    tree = ast.parse(source)
+    print(f"[+] Synthetic module: {source.count(chr(10)) + 1} lines, depth {args.depth}")
+
+    results = [run(cls, tree, args.repeat) for cls in (NestedWalkImportVisitor, ImportVisitor)]
+    print(tabulate(results, headers="keys", tablefmt="psql"))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,65 +8,418 @@ I are not responsible for any damage or data loss that may result from using thi
 Please make sure to backup your router settings before using this tool.  """
 
 
+import argparse
+import collections
 import datetime
+import hashlib
+import heapq
+import json
+import math
+import random
+import re
+import time
+import tracemalloc
+import unicodedata
+import zlib
 
+import numpy as np
 import pandas as pd
-import praw
+from tabulate import tabulate
 
-# Create a Reddit instance
-reddit = praw.Reddit(
-    client_id="",
-    client_secret="",
-    password="",
-    user_agent="",
-    username=""
-)
-
-spam_df = pd.DataFrame(columns=["author", "comment_body", "subreddit"])
-
-# Set the maximum number of comments to check
+# Set the number of recent comments the duplicate window covers
 max_comments = 10000
 SPAM_THRESHOLD = 3
 
-# Create a dataframe to store the comments
-df = pd.DataFrame(columns=["comment_id", "comment_hash"])
-
-# Start streaming comments from the API
-for comment in reddit.subreddit("all").stream.comments():
-    # Check if the maximum number of comments has been reached and start again
-
-    if len(df) >= max_comments:
-        df = pd.DataFrame(columns=["comment_id", "comment_hash"])
-        print("[-] Resetting Dataframe")
-
-    # Hash the comment text and add it to the dataframe
-    comment_hash = hash(comment.body)
-
-    # Print a debug with the comment hash include a timestamp
-
-    # print(
-    #     f"[+] Comment Hash: {comment_hash} at {datetime.datetime.now()}"
-    # )
-
-    df = pd.concat([df,
-                    pd.DataFrame({"comment_id": comment.id,
-                                  "comment_hash": comment_hash},
-                                 index=[0])],
-                   ignore_index=True)
-
-    # Check if the comment hash has been seen more than x times
-    if df["comment_hash"].value_counts()[comment_hash] > SPAM_THRESHOLD:
-        # Print the potential spam comment
-        # print(f"Comment by {comment.author}: {comment.body}")
-        # print(f"Comment on {comment.subreddit}")
-        # print("-------------------------------------------------")
-        # add the author, comment body and and subreddit to the spam dataframe
-        spam_df = pd.concat([spam_df,
-                             pd.DataFrame({"author": comment.author,
-                                           "comment_body": comment.body,
-                                           "subreddit": comment.subreddit},
-                                          index=[0])],
-                            ignore_index=True)
-        # using tabulate to print the dataframe
-        from tabulate import tabulate
-        print(tabulate(spam_df, headers="keys", tablefmt="psql"))
\ No newline at end of file
+# MinHash/LSH settings: 16 bands of 8 rows put the LSH threshold near 0.7
+NUM_PERM = 128
+LSH_BANDS = 16
+SHINGLE_SIZE = 5
+SIMILARITY_THRESHOLD = 0.8
+
+# Spam scores halve every SCORE_HALF_LIFE seconds; the report refreshes on a timer
+SCORE_HALF_LIFE = 3600
+REPORT_INTERVAL = 30
+REPORT_TOP_K = 10
+
+
+def stable_hash(text):
+    """64-bit content hash that, unlike hash(), is the same in every process."""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def normalize_text(body):
+    """Lowercase and strip punctuation, emoji and repeated whitespace from a comment."""
+    text = unicodedata.normalize("NFKC", body).lower()
+    text = re.sub(r"[^\w\s]+", "", text)
+    return " ".join(text.split())
+
+
+class DuplicateDetector:
+    """
+    Counts exact duplicates over a rolling window of the most recent comments.
+
+    The window is a fixed-size ring buffer of content hashes and a hash -> count
+    dict. Each new comment overwrites the oldest slot, so adding a comment and
+    evicting the oldest one are both O(1) and the window never has to be reset.
+    """
+
+    def __init__(self, window=max_comments):
+        self.window = window
+        self.ring = [None] * window
+        self.position = 0
+        self.counts = {}
+
+    def add(self, body):
+        """Add a comment body to the window and return how often it appears in it."""
+        comment_hash = stable_hash(body)
+
+        # Evict the comment that falls out of the window
+        oldest = self.ring[self.position]
+        if oldest is not None:
+            remaining = self.counts[oldest] - 1
+            if remaining:
+                self.counts[oldest] = remaining
+            else:
+                del self.counts[oldest]
+
+        self.ring[self.position] = comment_hash
+        self.position = (self.position + 1) % self.window
+
+        count = self.counts.get(comment_hash, 0) + 1
+        self.counts[comment_hash] = count
+        return count
+
+
+class MinHashDetector:
+    """
+    Counts near-duplicates over a rolling window of the most recent comments.
+
+    Comments are normalised, split into character shingles and reduced to a
+    MinHash signature. Signatures are indexed in LSH bands, so a new comment is
+    only compared with the few comments that share a band with it rather than
+    the whole window. Like DuplicateDetector, the window is a ring buffer and
+    evicting the oldest comment is O(bands).
+    """
+
+    def __init__(self, window=max_comments, num_perm=NUM_PERM, bands=LSH_BANDS,
+                 shingle_size=SHINGLE_SIZE, threshold=SIMILARITY_THRESHOLD, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.window = window
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+
+        # Multiply-shift hash family: (a * x + b) >> 32 over 32-bit shingle hashes
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+
+        self.signatures = np.zeros((window, num_perm), dtype=np.uint32)
+        self.ring = [None] * window
+        self.position = 0
+        self.buckets = [collections.defaultdict(set) for _ in range(bands)]
+
+    def signature(self, body):
+        """Return the MinHash signature of a comment body."""
+        text = normalize_text(body) or body.strip()
+        k = self.shingle_size
+        shingles = {text[i:i + k] for i in range(max(len(text) - k + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        permuted = (hashes[:, None] * self._a + self._b) >> np.uint64(32)
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [signature[i * rows:(i + 1) * rows].tobytes() for i in range(self.bands)]
+
+    def add(self, body):
+        """Add a comment body to the window and return how many near-copies of it the window holds."""
+        signature = self.signature(body)
+        keys = self._band_keys(signature)
+
+        # Evict the comment that falls out of the window
+        slot = self.position
+        old_keys = self.ring[slot]
+        if old_keys is not None:
+            for bucket, key in zip(self.buckets, old_keys):
+                members = bucket[key]
+                members.discard(slot)
+                if not members:
+                    del bucket[key]
+
+        # Collect everything sharing at least one band and confirm on the full signature
+        candidates = set()
+        for bucket, key in zip(self.buckets, keys):
+            members = bucket.get(key)
+            if members:
+                candidates.update(members)
+        count = 1
+        if candidates:
+            candidates = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            similarity = (self.signatures[candidates] == signature).mean(axis=1)
+            count += int((similarity >= self.threshold).sum())
+
+        self.signatures[slot] = signature
+        self.ring[slot] = keys
+        for bucket, key in zip(self.buckets, keys):
+            bucket[key].add(slot)
+        self.position = (slot + 1) % self.window
+
+        return count
+
+
+DETECTORS = {
+    "exact": DuplicateDetector,
+    "minhash": MinHashDetector,
+}
+
+class SpamAggregator:
+    """
+    Exponentially decayed spam scores per author and per subreddit.
+
+    Every spam hit adds 1 to the author's and the subreddit's score, and scores
+    halve every `half_life` seconds. Scores are kept as log2 values relative to
+    a fixed epoch, so a hit is an O(1) dict update, keys can be ranked without
+    decaying every entry first, and nothing overflows on long runs.
+    """
+
+    def __init__(self, half_life=SCORE_HALF_LIFE, recent=REPORT_TOP_K, epoch=None):
+        self.half_life = half_life
+        self.epoch = time.time() if epoch is None else epoch
+        self.authors = {}
+        self.subreddits = {}
+        self.recent = collections.deque(maxlen=recent)
+        self.total_hits = 0
+
+    def _age(self, now):
+        return (now - self.epoch) / self.half_life
+
+    @staticmethod
+    def _bump(scores, key, age):
+        old = scores.get(key)
+        if old is None:
+            scores[key] = age
+        else:
+            # log2(2**old + 2**age) without leaving log space
+            high, low = (old, age) if old > age else (age, old)
+            scores[key] = high + math.log2(1 + 2 ** (low - high))
+
+    def add(self, comment, now=None):
+        """Record a spam hit for the comment's author and subreddit."""
+        age = self._age(time.time() if now is None else now)
+        self._bump(self.authors, str(comment.author), age)
+        self._bump(self.subreddits, str(comment.subreddit), age)
+        self.recent.append(comment)
+        self.total_hits += 1
+
+    def top(self, scores, k=REPORT_TOP_K, now=None):
+        """Return the k highest (key, current score) pairs from `scores`."""
+        age = self._age(time.time() if now is None else now)
+        return [(key, 2 ** (value - age)) for key, value in heapq.nlargest(k, scores.items(), key=lambda item: item[1])]
+
+    def prune(self, min_score=0.01, now=None):
+        """Forget keys whose decayed score has fallen below `min_score`."""
+        cutoff = self._age(time.time() if now is None else now) + math.log2(min_score)
+        for scores in (self.authors, self.subreddits):
+            for key in [key for key, value in scores.items() if value < cutoff]:
+                del scores[key]
+
+    def report(self, k=REPORT_TOP_K, now=None):
+        """Render the top authors, top subreddits and most recent spam as text tables."""
+        now = time.time() if now is None else now
+        authors = tabulate([(a, f"{s:.2f}") for a, s in self.top(self.authors, k, now)],
+                           headers=["author", "score"], tablefmt="psql")
+        subreddits = tabulate([(r, f"{s:.2f}") for r, s in self.top(self.subreddits, k, now)],
+                              headers=["subreddit", "score"], tablefmt="psql")
+        recent = tabulate([(c.author, " ".join(c.body.split())[:80], c.subreddit) for c in self.recent],
+                          headers=["author", "comment_body", "subreddit"], tablefmt="psql")
+        return (f"[+] {self.total_hits} spam hits, {datetime.datetime.now():%Y-%m-%d %H:%M:%S}\n"
+                f"{authors}\n{subreddits}\n{recent}")
+
+
+# Recorded or synthetic comment, with the attributes the detector loop reads from praw comments
+Comment = collections.namedtuple("Comment", ["id", "author", "body", "subreddit"])
+
+
+class RedditSource:
+    """Live comment stream from r/all."""
+
+    def __init__(self, subreddit="all"):
+        # praw is only needed for live streaming, so replay and benchmarks run without it
+        import praw
+
+        # Create a Reddit instance
+        self.reddit = praw.Reddit(
+            client_id="",
+            client_secret="",
+            password="",
+            user_agent="",
+            username=""
+        )
+        self.subreddit = subreddit
+
+    def __iter__(self):
+        return iter(self.reddit.subreddit(self.subreddit).stream.comments())
+
+
+class ReplaySource:
+    """
+    Replays comments from a JSON-lines file, one {"id", "author", "body",
+    "subreddit"} object per line, optionally throttled to `rate` comments/sec.
+    """
+
+    def __init__(self, path, rate=None):
+        self.path = path
+        self.rate = rate
+
+    def __iter__(self):
+        interval = 1.0 / self.rate if self.rate else 0.0
+        next_due = time.perf_counter()
+        with open(self.path, encoding="utf-8") as fh:
+            for line in fh:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if interval:
+                    # Pace against a fixed schedule so a slow consumer does not drift the rate
+                    next_due += interval
+                    delay = next_due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                yield Comment(record.get("id"), record.get("author"), record.get("body", ""), record.get("subreddit"))
+
+
+def write_synthetic_comments(path, count, spam_rate=0.02, seed=0):
+    """
+    Write `count` synthetic comments to a JSON-lines file for ReplaySource.
+
+    Roughly `spam_rate` of them are copies of a few spam messages with random
+    casing, punctuation and emoji noise, the rest are random word salad.
+    """
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(2, 9))) for _ in range(20000)]
+    spam = [" ".join(rng.choices(vocabulary, k=rng.randint(8, 25))) for _ in range(20)]
+    noise = ["", "!!", " 🚀", " 😂😂", "...", " 🔥"]
+
+    with open(path, "w", encoding="utf-8") as fh:
+        for i in range(count):
+            if rng.random() < spam_rate:
+                body = rng.choice(spam)
+                body = body.upper() if rng.random() < 0.3 else body
+                body = body.replace(" ", rng.choice([" ", ", ", "  "])) + rng.choice(noise)
+                author = f"spammer{rng.randint(0, 50)}"
+            else:
+                body = " ".join(rng.choices(vocabulary, k=rng.randint(1, 60)))
+                author = f"user{rng.randint(0, 100000)}"
+            record = {"id": f"c{i}", "author": author, "body": body, "subreddit": f"sub{rng.randint(0, 500)}"}
+            fh.write(json.dumps(record) + "\n")
+
+
+def benchmark(source, detectors=DETECTORS, window=max_comments):
+    """
+    Run every detector backend over the same comments and report
+    sustained comments/sec, p99 per-comment latency and peak memory.
+
+    The comments are loaded up front so source I/O is not measured, and memory
+    is measured in a second pass because tracemalloc slows the timed run down.
+    """
+    bodies = [comment.body for comment in source]
+    results = []
+    for name, detector_cls in detectors.items():
+        detector = detector_cls(window)
+        latencies = np.empty(len(bodies))
+        hits = 0
+        clock = time.perf_counter
+        started = clock()
+        for i, body in enumerate(bodies):
+            t0 = clock()
+            if detector.add(body) > SPAM_THRESHOLD:
+                hits += 1
+            latencies[i] = clock() - t0
+        elapsed = clock() - started
+
+        tracemalloc.start()
+        detector = detector_cls(window)
+        for body in bodies:
+            detector.add(body)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results.append({
+            "detector": name,
+            "comments": len(bodies),
+            "comments/sec": round(len(bodies) / elapsed) if elapsed else 0,
+            "p99 latency (us)": round(float(np.percentile(latencies, 99)) * 1e6, 1) if bodies else 0.0,
+            "peak memory (MiB)": round(peak / 2 ** 20, 1),
+            "spam hits": hits,
+        })
+    return pd.DataFrame(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect repeated spam comments on r/all")
+    parser.add_argument("--detector", choices=sorted(DETECTORS), default="minhash",
+                        help="exact: identical comments only; minhash: near-duplicates too")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="Read comments from a JSON-lines file instead of the live stream")
+    parser.add_argument("--rate", type=float, help="Replay speed in comments/sec (default: as fast as possible)")
+    parser.add_argument("--make-synthetic", type=int, metavar="N",
+                        help="Write N synthetic comments to the --replay file and exit")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Benchmark every detector backend on the --replay file and exit")
+    args = parser.parse_args()
+
+    if (args.make_synthetic or args.benchmark) and not args.replay:
+        parser.error("--make-synthetic and --benchmark need --replay FILE")
+
+    if args.make_synthetic:
+        write_synthetic_comments(args.replay, args.make_synthetic)
+        print(f"[+] Wrote {args.make_synthetic} synthetic comments to {args.replay}")
+        return
+
+    if args.benchmark:
+        print(tabulate(benchmark(ReplaySource(args.replay)), headers="keys", tablefmt="psql", showindex=False))
+        return
+
+    source = ReplaySource(args.replay, args.rate) if args.replay else RedditSource()
+
+    aggregator = SpamAggregator()
+    next_report = time.monotonic() + REPORT_INTERVAL
+
+    detector = DETECTORS[args.detector](max_comments)
+
+    # Start streaming comments from the source
+    for comment in source:
+        # Add the comment to the rolling window and get its duplicate count
+        seen = detector.add(comment.body)
+
+        # Print a debug with the comment hash include a timestamp
+
+        # print(
+        #     f"[+] Comment seen {seen} times at {datetime.datetime.now()}"
+        # )
+
+        # Check if the comment hash has been seen more than x times
+        if seen > SPAM_THRESHOLD:
+            # Print the potential spam comment
+            # print(f"Comment by {comment.author}: {comment.body}")
+            # print(f"Comment on {comment.subreddit}")
+            # print("-------------------------------------------------")
+            # add the author and subreddit to the decayed spam scores
+            aggregator.add(comment)
+
+        # Refresh the report on a timer rather than on every hit
+        if time.monotonic() >= next_report:
+            aggregator.prune()
+            print(aggregator.report())
+            next_report = time.monotonic() + REPORT_INTERVAL
+
+    # Final report once a replayed stream runs out
+    print(aggregator.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -16,67 +16,856 @@ SOFTWARE. """
 # C0301: Line too long (%s/%s)
 # W1201: Specify string format arguments as logging function parameters
 
+import argparse
+import hashlib
+import io
 import logging
 import os
+import re
+import shutil
+import sqlite3
+import struct
+import tempfile
+import time
+import zlib
+from collections import defaultdict, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Union
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
 
-from PIL import Image
-from PyPDF2 import PdfFileReader, PdfFileWriter
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.errors import PdfReadError
+from PyPDF2.generic import DictionaryObject, IndirectObject, PdfObject, StreamObject, read_object
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+JPEG_EXTENSIONS = {".jpg", ".jpeg", ".jpe", ".jfif"}
+# Parsing a PDF is CPU bound, so those go to a process pool; JPEG stripping is
+# a streaming copy and runs in threads
+CPU_BOUND_EXTENSIONS = {".pdf"}
+SUPPORTED_EXTENSIONS = JPEG_EXTENSIONS | CPU_BOUND_EXTENSIONS
+COPY_BUFFER_SIZE = 1 << 20
+IO_THREADS = 8
+# The Info dictionary and the XMP stream header must end within this many
+# bytes of the object's start to be blanked in place
+PDF_OBJECT_SCAN = 1 << 16
+# Temp files are named TEMP_PREFIX + pid + "-..." so the walk can tell them from user files
+TEMP_PREFIX = ".tmp-remove_metadata-"
 
-def remove_metadata(file_path: Union[str, Path]):
+# Ledger of files known to be clean. It lists every path in the tree, so by
+# default it lives outside it, one per scrubbed directory
+DEFAULT_LEDGER_DIR = Path.home() / ".cache" / "remove_metadata"
+LEDGER_COMMIT_EVERY = 1000
+
+ScrubResult = namedtuple("ScrubResult", ["path", "extension", "size", "seconds", "ok", "skipped", "digest", "mtime_ns"])
+
+# APPn segments that affect how the image is decoded or displayed and carry no
+# personal data: JFIF/JFXX (APP0), ICC colour profiles (APP2) and the Adobe
+# colour transform flag (APP14), without which CMYK JPEGs decode wrongly.
+# Every other APPn segment (EXIF, XMP, IPTC, maker data, ...) and COM is dropped.
+KEEP_APP_SEGMENTS = {
+    0xE0: (b"JFIF\x00", b"JFXX\x00"),
+    0xE2: (b"ICC_PROFILE\x00",),
+    0xEE: (b"Adobe",),
+}
+
+
+class JpegFormatError(ValueError):
+    """Raised when a file does not have a valid JPEG marker structure."""
+
+
+def _read_exact(src: BinaryIO, size: int) -> bytes:
+    data = src.read(size)
+    if len(data) != size:
+        raise JpegFormatError("Unexpected end of file")
+    return data
+
+
+def _is_metadata_segment(marker: int, payload_start: bytes) -> bool:
+    if marker == 0xFE:
+        return True
+    if 0xE0 <= marker <= 0xEF:
+        return not payload_start.startswith(KEEP_APP_SEGMENTS.get(marker, ()))
+    return False
+
+
+def strip_jpeg(src: BinaryIO, dst: BinaryIO) -> int:
+    """
+    Copy a JPEG from src to dst without its metadata segments.
+
+    Works at the marker level: segments before the first start-of-scan are
+    copied or skipped one by one and everything from the start-of-scan on
+    (the compressed image data) is copied verbatim, so no pixel is decoded or
+    re-encoded and memory use does not depend on the image size.
+
+    Returns the number of metadata bytes dropped.
+    """
+    if src.read(2) != b"\xff\xd8":
+        raise JpegFormatError("Missing start-of-image marker")
+    dst.write(b"\xff\xd8")
+
+    dropped = 0
+    while True:
+        marker = _read_exact(src, 2)
+        while marker[1] == 0xFF:
+            # Fill bytes before a marker are allowed; skip them
+            marker = marker[1:] + _read_exact(src, 1)
+        if marker[0] != 0xFF:
+            raise JpegFormatError(f"Expected a marker, found {marker.hex()}")
+        if marker[1] == 0xD9:
+            dst.write(marker)
+            return dropped
+
+        length_bytes = _read_exact(src, 2)
+        length = struct.unpack(">H", length_bytes)[0]
+        if length < 2:
+            raise JpegFormatError(f"Invalid segment length {length}")
+        payload = _read_exact(src, length - 2)
+        if _is_metadata_segment(marker[1], payload[:12]):
+            dropped += length + 2
+        else:
+            dst.write(marker + length_bytes + payload)
+
+        if marker[1] == 0xDA:
+            # Start of scan: the rest is entropy-coded data (and, for
+            # progressive JPEGs, further tables and scans), copied as is
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+            return dropped
+
+
+def _rewrite_file(file_path: Path, rewrite: Callable[[BinaryIO, BinaryIO], int]) -> int:
+    """
+    Stream file_path through rewrite(src, dst) into a temp file next to it and
+    move that over the original, so a failure never leaves a half-written file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=str(file_path.parent), prefix=f"{TEMP_PREFIX}{os.getpid()}-", suffix=file_path.suffix)
+    try:
+        with open(str(file_path), "rb") as src, os.fdopen(fd, "wb") as dst:
+            result = rewrite(src, dst)
+            # The data must be on disk before the rename makes it the real file
+            dst.flush()
+            os.fsync(dst.fileno())
+        shutil.copymode(str(file_path), tmp_path)
+        os.replace(tmp_path, str(file_path))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    _fsync_directory(file_path.parent)
+    return result
+
+
+def _fsync_directory(directory: Path):
+    """Persist a rename; not possible (or needed) on Windows."""
+    try:
+        fd = os.open(str(directory), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class PdfInPlaceError(ValueError):
+    """Raised when a PDF's metadata cannot be blanked in place."""
+
+
+def _copy_bytes(src: BinaryIO, dst: BinaryIO, count: int):
+    while count > 0:
+        chunk = src.read(min(count, COPY_BUFFER_SIZE))
+        if not chunk:
+            raise PdfInPlaceError("Unexpected end of file")
+        dst.write(chunk)
+        count -= len(chunk)
+
+
+def _copy_with_patches(src: BinaryIO, dst: BinaryIO, patches: List[Tuple[int, bytes]]):
+    """Stream src to dst, overwriting the bytes at each (offset, replacement)."""
+    src.seek(0)
+    position = 0
+    for offset, replacement in sorted(patches):
+        _copy_bytes(src, dst, offset - position)
+        dst.write(replacement)
+        position = offset + len(replacement)
+        src.seek(position)
+    shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+
+
+def _object_header(src: BinaryIO, offset: int) -> Optional[Tuple[int, bytes, int]]:
+    """Return the number of the object at offset, the bytes after its "obj" keyword and their file offset."""
+    src.seek(offset)
+    window = src.read(PDF_OBJECT_SCAN)
+    header = re.match(rb"\s*(\d+)\s+\d+\s+obj", window)
+    if header is None:
+        return None
+    return int(header.group(1)), window[header.end():], offset + header.end()
+
+
+def _read_object_at(src: BinaryIO, reader: PdfReader, offset: int, num: int) -> Optional[PdfObject]:
+    """Parse object num written at offset; None if something else (or nothing) is there."""
+    found = _object_header(src, offset)
+    if found is None or found[0] != num:
+        return None
+    _, body, start = found
+    src.seek(start + len(body) - len(body.lstrip()))
+    try:
+        return read_object(src, reader)
+    except (PdfReadError, ValueError):
+        return None
+
+
+def _blank_object_patch(src: BinaryIO, offset: int, replacement: bytes) -> Tuple[int, bytes]:
+    """Replace the body of the object at offset with replacement, padded with spaces to the same length."""
+    _, body, start = _object_header(src, offset)
+    # Keep the whitespace after "obj": "5 0 objnull" would be a single keyword
+    space = len(body) - len(body.lstrip())
+    end = body.find(b"endobj") - space
+    if end < len(replacement):
+        raise PdfInPlaceError(f"Object at offset {offset} is too large to blank in place")
+    return start + space, replacement + b" " * (end - len(replacement))
+
+
+def _blank_stream_patch(src: BinaryIO, reader: PdfReader, offset: int) -> Tuple[int, bytes]:
+    """Replace the data of the stream object at offset with spaces."""
+    _, body, start = _object_header(src, offset)
+    keyword = re.search(rb"\bstream(\r\n|\n|\r)", body)
+    if keyword is None:
+        raise PdfInPlaceError("Stream header is too large to blank in place")
+    # Read /Length from the raw dictionary: parsers drop it once the data is loaded
+    length = re.search(rb"/Length\s+(\d+)(?:\s+(\d+)\s+R)?", body[:keyword.start()])
+    if length is None:
+        raise PdfInPlaceError("Stream has no /Length")
+    if length.group(2) is not None:
+        size = reader.get_object(IndirectObject(int(length.group(1)), int(length.group(2)), reader))
+    else:
+        size = length.group(1)
+    return start + keyword.end(), b" " * int(size)
+
+
+def _startxref(src: BinaryIO) -> int:
+    src.seek(0, os.SEEK_END)
+    size = src.tell()
+    src.seek(max(0, size - 1024))
+    found = re.findall(rb"startxref\s+(\d+)", src.read())
+    if not found:
+        raise PdfInPlaceError("No startxref found")
+    return int(found[-1])
+
+
+def _read_xref_table(src: BinaryIO, reader: PdfReader, offset: int) -> Tuple[DictionaryObject, List[Tuple[int, int, int]]]:
+    data = b""
+    while b"trailer" not in data:
+        chunk = src.read(COPY_BUFFER_SIZE)
+        if not chunk:
+            raise PdfInPlaceError(f"Cross-reference table at {offset} has no trailer")
+        data += chunk
+    table = data[:data.index(b"trailer")]
+    tokens = table.split()
+    entries = []
+    position = 0
+    while position < len(tokens):
+        first, count = int(tokens[position]), int(tokens[position + 1])
+        rows = tokens[position + 2:position + 2 + 3 * count]
+        for row in range(count):
+            if rows[3 * row + 2] == b"n":
+                entries.append((first + row, 1, int(rows[3 * row])))
+        position += 2 + 3 * count
+
+    src.seek(offset + len(b"xref") + len(table) + len(b"trailer"))
+    while src.read(1).isspace():
+        pass
+    src.seek(-1, os.SEEK_CUR)
+    return read_object(src, reader), entries
+
+
+def _read_xref_stream(src: BinaryIO, reader: PdfReader, offset: int) -> Tuple[DictionaryObject, List[Tuple[int, int, int]]]:
+    found = _object_header(src, offset)
+    if found is None:
+        raise PdfInPlaceError(f"No cross-reference section at {offset}")
+    xref = _read_object_at(src, reader, offset, found[0])
+    if not isinstance(xref, StreamObject):
+        raise PdfInPlaceError(f"No cross-reference stream at {offset}")
+    widths = [int(width) for width in xref["/W"]]
+    index = [int(value) for value in xref.get("/Index", [0, xref["/Size"]])]
+    data = xref.get_data()
+    entries = []
+    position = 0
+    for first, count in zip(index[0::2], index[1::2]):
+        for num in range(first, first + count):
+            fields = []
+            for width in widths:
+                fields.append(int.from_bytes(data[position:position + width], "big"))
+                position += width
+            # An absent type field means every entry is an uncompressed object
+            kind = fields[0] if widths[0] else 1
+            if kind in (1, 2):
+                entries.append((num, kind, fields[1]))
+    return xref, entries
+
+
+def _xref_sections(src: BinaryIO, reader: PdfReader) -> Iterator[Tuple[DictionaryObject, List[Tuple[int, int, int]]]]:
+    """
+    Yield the trailer and in-use entries of every cross-reference section.
+
+    /Prev and /XRefStm are followed back to the original file, so superseded
+    sections are included. Entries are (object number, 1, file offset) for
+    uncompressed objects and (object number, 2, object stream number) for
+    objects in an object stream.
+    """
+    pending = [_startxref(src)]
+    seen = set()
+    while pending:
+        offset = pending.pop()
+        if offset in seen:
+            continue
+        seen.add(offset)
+        src.seek(offset)
+        if src.read(4) == b"xref":
+            trailer, entries = _read_xref_table(src, reader, offset)
+        else:
+            trailer, entries = _read_xref_stream(src, reader, offset)
+        for key in ("/Prev", "/XRefStm"):
+            if key in trailer:
+                pending.append(int(trailer[key]))
+        yield trailer, entries
+
+
+def _indirect_num(dictionary: DictionaryObject, key: str) -> Optional[int]:
+    value = dictionary.raw_get(key) if key in dictionary else None
+    return value.idnum if isinstance(value, IndirectObject) else None
+
+
+class PdfRevisions:
+    """Every place each object of a PDF was written, across all of its incremental updates."""
+
+    def __init__(self, src: BinaryIO, reader: PdfReader):
+        self.src = src
+        self.reader = reader
+        self.trailers = []
+        self.offsets = defaultdict(set)  # object number -> file offsets
+        self.streams = defaultdict(set)  # object number -> numbers of object streams holding it
+        self._object_streams = {}
+        for trailer, entries in _xref_sections(src, reader):
+            self.trailers.append(trailer)
+            for num, kind, location in entries:
+                (self.offsets if kind == 1 else self.streams)[num].add(location)
+
+    def is_live(self, num: int, offset: int) -> bool:
+        """Whether offset holds the current definition of object num."""
+        return num not in self.reader.xref_objStm and any(table.get(num) == offset for table in self.reader.xref.values())
+
+    def object_stream(self, offset: int) -> Tuple[int, StreamObject, List[Tuple[int, bytes]]]:
+        """Decode the object stream at offset into (object number, object bytes) slots."""
+        if offset not in self._object_streams:
+            num = _object_header(self.src, offset)[0]
+            stream = _read_object_at(self.src, self.reader, offset, num)
+            data = stream.get_data()
+            first = int(stream["/First"])
+            header = [int(value) for value in data[:first].split()[:2 * int(stream["/N"])]]
+            starts = header[1::2] + [len(data) - first]
+            slots = [(header[2 * i], data[first + starts[i]:first + starts[i + 1]]) for i in range(len(starts) - 1)]
+            self._object_streams[offset] = num, stream, slots
+        return self._object_streams[offset]
+
+    def versions(self, num: int) -> Iterator[Tuple[int, Optional[int], PdfObject]]:
+        """
+        Yield every readable version of object num as (file offset, slot, object).
+
+        slot is None for an uncompressed object at offset, or its index in the
+        object stream written at offset.
+        """
+        for offset in sorted(self.offsets.get(num, ())):
+            obj = _read_object_at(self.src, self.reader, offset, num)
+            if obj is not None:
+                yield offset, None, obj
+        for stream_num in self.streams.get(num, ()):
+            for offset in sorted(self.offsets.get(stream_num, ())):
+                if _object_header(self.src, offset) is None:
+                    continue
+                for slot, (slot_num, raw) in enumerate(self.object_stream(offset)[2]):
+                    if slot_num == num:
+                        yield offset, slot, read_object(io.BytesIO(raw.lstrip()), self.reader)
+
+
+def _object_stream_body(stream: StreamObject, slots: List[Tuple[int, bytes]]) -> bytes:
+    """Serialize an object stream holding slots, keeping the original's /Extends."""
+    objects = [raw.strip() + b"\n" for _, raw in slots]
+    header = []
+    position = 0
+    for (num, _), raw in zip(slots, objects):
+        header.append(f"{num} {position}")
+        position += len(raw)
+    prefix = (" ".join(header) + "\n").encode()
+    data = zlib.compress(prefix + b"".join(objects))
+    body = io.BytesIO()
+    body.write(f"<< /Type /ObjStm /N {len(slots)} /First {len(prefix)} /Filter /FlateDecode /Length {len(data)} ".encode())
+    if "/Extends" in stream:
+        body.write(b"/Extends ")
+        stream.raw_get("/Extends").write_to_stream(body, None)
+    body.write(b" >>\nstream\n" + data + b"\nendstream")
+    return body.getvalue()
+
+
+def _write_pdf_update(dst: BinaryIO, src: BinaryIO, reader: PdfReader, objects: List[Tuple[int, int, bytes]]):
+    """
+    Append an incremental update that redefines objects and drops /Info from the trailer.
+
+    objects holds (object number, generation, serialized body). The update
+    uses a cross-reference stream when the file's last section is one and a
+    classic table otherwise, so /Prev always points at the same kind.
+    """
+    prev = _startxref(src)
+    src.seek(prev)
+    classic = src.read(4) == b"xref"
+    # Trailers built from cross-reference streams may lack /Size
+    known = [num for table in reader.xref.values() for num in table] + list(reader.xref_objStm)
+    size = max([int(reader.trailer.get("/Size", 0))] + [num + 1 for num in known])
+
+    dst.seek(0, os.SEEK_END)
+    dst.write(b"\n")
+    rows = []
+    for num, gen, body in objects:
+        rows.append((num, dst.tell(), gen))
+        dst.write(f"{num} {gen} obj\n".encode() + body + b"\nendobj\n")
+    rows.sort()
+
+    trailer = [(key, reader.trailer.raw_get(key)) for key in ("/Root", "/ID") if key in reader.trailer]
+
+    xref_offset = dst.tell()
+    if classic:
+        dst.write(b"xref\n")
+        for num, offset, gen in rows:
+            dst.write(f"{num} 1\n{offset:010d} {gen:05d} n\r\n".encode())
+        dst.write(f"trailer\n<< /Size {size} /Prev {prev} ".encode())
+    else:
+        xref_num = size
+        rows.append((xref_num, xref_offset, 0))
+        data = b"".join(b"\x01" + offset.to_bytes(8, "big") + gen.to_bytes(2, "big") for _, offset, gen in rows)
+        index = " ".join(f"{num} 1" for num, _, _ in rows)
+        dst.write(f"{xref_num} 0 obj\n<< /Type /XRef /Size {size + 1} /W [1 8 2] /Index [{index}] /Length {len(data)} /Prev {prev} ".encode())
+    for key, value in trailer:
+        dst.write(f"{key} ".encode())
+        value.write_to_stream(dst, None)
+        dst.write(b" ")
+    dst.write(b">>\n")
+    if not classic:
+        dst.write(b"stream\n" + data + b"\nendstream\nendobj\n")
+    dst.write(f"startxref\n{xref_offset}\n%%EOF\n".encode())
+
+
+def strip_pdf(src: BinaryIO, dst: BinaryIO) -> int:
+    """
+    Copy a PDF from src to dst without its document information dictionary or XMP metadata.
+
+    Only the cross-reference data and the few objects involved are parsed.
+    While the file is streamed to dst, every version of the Info dictionary
+    (including those left by earlier incremental updates) is overwritten with
+    an empty one, the indirect strings it references with null and the XMP
+    packets with spaces, keeping every byte offset valid. An incremental update
+    is then appended that drops /Metadata from the catalog and /Info from the
+    trailer, and that replaces any object stream which held one of those
+    objects. Pages are never loaded, so memory does not grow with the page
+    count.
+
+    Returns the number of metadata bytes blanked.
+    """
+    try:
+        return _strip_pdf_in_place(src, dst)
+    except PdfInPlaceError as e:
+        logging.warning(f"Falling back to a full PDF rewrite: {e}")
+        src.seek(0)
+        dst.seek(0)
+        dst.truncate()
+        return _write_pdf_without_metadata(src, dst)
+
+
+def _strip_pdf_in_place(src: BinaryIO, dst: BinaryIO) -> int:
+    reader = PdfReader(src)
+    if reader.is_encrypted:
+        raise PdfInPlaceError("Encrypted PDFs cannot be updated in place")
+    catalog_ref = reader.trailer.raw_get("/Root")
+    if not isinstance(catalog_ref, IndirectObject):
+        raise PdfInPlaceError("Unexpected trailer structure")
+    catalog = catalog_ref.get_object()
+
+    revisions = PdfRevisions(src, reader)
+    catalog_nums = {_indirect_num(trailer, "/Root") for trailer in revisions.trailers}
+    info_nums = {_indirect_num(trailer, "/Info") for trailer in revisions.trailers} - {None}
+
+    # Object number -> what to leave in place of each version of it. Older
+    # Info dictionaries, the strings they reference and earlier XMP packets
+    # all stay in the file after an incremental update, so every one goes.
+    targets = {num: b"<<>>" for num in info_nums}
+    for num in info_nums:
+        for _, _, info in revisions.versions(num):
+            if isinstance(info, DictionaryObject):
+                for key in info:
+                    value = info.raw_get(key)
+                    if isinstance(value, IndirectObject):
+                        targets.setdefault(value.idnum, b"null")
+    for num in catalog_nums - {None}:
+        for _, _, old_catalog in revisions.versions(num):
+            if isinstance(old_catalog, DictionaryObject) and _indirect_num(old_catalog, "/Metadata") is not None:
+                targets[_indirect_num(old_catalog, "/Metadata")] = b"null"
+    for num in catalog_nums:
+        targets.pop(num, None)
+
+    patches = {}
+    compressed = defaultdict(dict)  # object stream offset -> {slot: replacement}
+    for num, replacement in targets.items():
+        for offset, slot, obj in revisions.versions(num):
+            if slot is not None:
+                compressed[offset][slot] = replacement
+            elif isinstance(obj, StreamObject):
+                patches.update([_blank_stream_patch(src, reader, offset)])
+            else:
+                patches.update([_blank_object_patch(src, offset, replacement)])
+
+    # Objects in an object stream cannot be blanked in place: the update
+    # carries a copy of the stream with those slots emptied and the old
+    # stream's data is blanked like any superseded object
+    updates = []
+    for offset, replacements in compressed.items():
+        num, stream, slots = revisions.object_stream(offset)
+        patches.update([_blank_stream_patch(src, reader, offset)])
+        if revisions.is_live(num, offset):
+            slots = [(slot_num, replacements.get(slot, raw)) for slot, (slot_num, raw) in enumerate(slots)]
+            updates.append((num, 0, _object_stream_body(stream, slots)))
+
+    _copy_with_patches(src, dst, list(patches.items()))
+    new_catalog = DictionaryObject({key: value for key, value in catalog.items() if key != "/Metadata"})
+    catalog_body = io.BytesIO()
+    new_catalog.write_to_stream(catalog_body, None)
+    updates.append((catalog_ref.idnum, catalog_ref.generation, catalog_body.getvalue()))
+    _write_pdf_update(dst, src, reader, updates)
+    return sum(len(replacement) for replacement in patches.values())
+
+
+def _write_pdf_without_metadata(src: BinaryIO, dst: BinaryIO) -> int:
+    """Rebuild the document from its pages; holds the whole PDF in memory."""
+    pdf_reader = PdfReader(src)
+    pdf_writer = PdfWriter()
+
+    for page in pdf_reader.pages:
+        pdf_writer.add_page(page)
+
+    # PdfWriter starts from an Info dictionary holding its own /Producer;
+    # left in, pdf_has_metadata would flag the output on every later run
+    pdf_writer._info.get_object().clear()
+    pdf_writer.write(dst)
+    return 0
+
+
+def remove_metadata(file_path: Union[str, Path]) -> bool:
     """
     Remove metadata from the given file.
+
+    Returns True if the file was cleaned.
     """
     try:
+        file_path = Path(file_path)
         extension = file_path.suffix.lower()
 
         if extension == ".pdf":
             # Remove metadata from PDF files
-            pdf_reader = PdfFileReader(str(file_path))
-            pdf_writer = PdfFileWriter()
+            blanked = _rewrite_file(file_path, strip_pdf)
+            logging.info(f"Removed {blanked} bytes of metadata from {file_path}")
 
-            for page_num in range(pdf_reader.numPages):
-                pdf_writer.add_page(pdf_reader.getPage(page_num))
-
-            with open(str(file_path), "wb") as output_pdf:
-                pdf_writer.write(output_pdf)
-
-        elif extension in [".jpg", ".jpeg", ".jpe", ".jfif", ".mp4"]:
+        elif extension in JPEG_EXTENSIONS:
             # Remove metadata from JPEG files
-            image = Image.open(str(file_path))
-            image_info = image.info
-            logging.info(f"Metadata in {file_path}: {image_info}")
-            data = list(image.getdata())
-            image_without_exif = Image.new(image.mode, image.size)
-            image_without_exif.putdata(data)
-            image_without_exif.save(str(file_path))
+            dropped = _rewrite_file(file_path, strip_jpeg)
+            logging.info(f"Removed {dropped} bytes of metadata from {file_path}")
 
         else:
             logging.warning(f"Metadata removal is not supported for {extension} files.")
+            return False
 
     except Exception as e:
         logging.error(f"Failed to remove metadata from {file_path}: {e}")
+        return False
+
+    return True
+
+
+def file_digest(file_path: Union[str, Path]) -> str:
+    """BLAKE2b hex digest of a file's contents, read in chunks."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(str(file_path), "rb") as fh:
+        for chunk in iter(lambda: fh.read(COPY_BUFFER_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def jpeg_has_metadata(file_path: Union[str, Path]) -> bool:
+    """Check the segments before the first start-of-scan for any that strip_jpeg would drop."""
+    with open(str(file_path), "rb") as src:
+        if src.read(2) != b"\xff\xd8":
+            raise JpegFormatError("Missing start-of-image marker")
+        while True:
+            marker = _read_exact(src, 2)
+            while marker[1] == 0xFF:
+                marker = marker[1:] + _read_exact(src, 1)
+            if marker[0] != 0xFF:
+                raise JpegFormatError(f"Expected a marker, found {marker.hex()}")
+            if marker[1] in (0xD9, 0xDA):
+                return False
+            length = struct.unpack(">H", _read_exact(src, 2))[0]
+            if length < 2:
+                raise JpegFormatError(f"Segment length {length} is too short")
+            payload_start = src.read(min(12, length - 2))
+            if _is_metadata_segment(marker[1], payload_start):
+                return True
+            src.seek(length - 2 - len(payload_start), os.SEEK_CUR)
+
+
+def pdf_has_metadata(file_path: Union[str, Path]) -> bool:
+    """Check for a non-empty Info dictionary or an XMP stream in the catalog."""
+    with open(str(file_path), "rb") as src:
+        reader = PdfReader(src)
+        if reader.is_encrypted:
+            return True
+        info = reader.trailer.get("/Info")
+        catalog = reader.trailer["/Root"].get_object()
+        return bool(info is not None and info.get_object()) or "/Metadata" in catalog
+
+
+def has_metadata(file_path: Union[str, Path]) -> bool:
+    """Quick check whether a supported file still has metadata to remove."""
+    if Path(file_path).suffix.lower() == ".pdf":
+        return pdf_has_metadata(file_path)
+    return jpeg_has_metadata(file_path)
+
+
+def scrub_file(file_path: str, known_digest: Optional[str] = None) -> ScrubResult:
+    """
+    Remove metadata from one file and time it; runs inside the worker pools.
+
+    The file is left untouched when its contents still hash to known_digest
+    (what the ledger recorded after it was last cleaned) or when the quick
+    check finds no metadata. Otherwise it is cleaned and its new digest is
+    returned for the ledger.
+    """
+    extension = Path(file_path).suffix.lower()
+    started = time.perf_counter()
+    try:
+        size = os.path.getsize(file_path)
+    except OSError as e:
+        logging.error(f"Failed to remove metadata from {file_path}: {e}")
+        return ScrubResult(file_path, extension, 0, time.perf_counter() - started, False, False, None, None)
+
+    digest = None
+    skipped = False
+    try:
+        if known_digest:
+            digest = file_digest(file_path)
+            skipped = digest == known_digest
+        if not skipped:
+            skipped = not has_metadata(file_path)
+    except Exception as e:
+        # Leave it to remove_metadata to clean or report the file
+        logging.debug(f"Quick check failed for {file_path}: {e}")
+
+    if skipped:
+        ok = True
+    else:
+        ok = remove_metadata(file_path)
+        digest = None
+    mtime_ns = None
+    if ok:
+        try:
+            if digest is None:
+                digest = file_digest(file_path)
+            mtime_ns = os.stat(file_path).st_mtime_ns
+        except OSError as e:
+            logging.error(f"Failed to fingerprint {file_path}: {e}")
+            ok = False
+    return ScrubResult(file_path, extension, size, time.perf_counter() - started, ok, skipped, digest, mtime_ns)
+
+
+class CleanLedger:
+    """
+    SQLite record of the files known to be clean: path, size, mtime and content digest.
+
+    A file whose size and mtime still match its entry is skipped without
+    being opened; with verify=True its contents are hashed and compared with
+    the recorded digest instead, which also catches edits that preserved the
+    mtime.
+    """
+
+    def __init__(self, path: Union[str, Path], verify: bool = False):
+        self.verify = verify
+        self.path = os.path.abspath(str(path))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS clean_files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT)"
+        )
+        self.pending: List[tuple] = []
+
+    def check(self, file_path: str) -> Tuple[bool, Optional[str]]:
+        """
+        Return (skip, known_digest): skip is True when the file can be passed
+        over without opening it, and known_digest is set when the worker should
+        compare the contents against it.
+        """
+        row = self.db.execute(
+            "SELECT size, mtime_ns, digest FROM clean_files WHERE path = ?", (os.path.abspath(file_path),)
+        ).fetchone()
+        if row is None:
+            return False, None
+        if self.verify:
+            return False, row[2]
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            # Gone or unreadable since the walk: let scrub_file report it
+            return False, None
+        return (stat.st_size, stat.st_mtime_ns) == (row[0], row[1]), None
+
+    def record(self, result: ScrubResult) -> bool:
+        """Queue a cleaned file for the ledger; False if it vanished before it could be recorded."""
+        try:
+            size = os.path.getsize(result.path)
+        except OSError as e:
+            logging.error(f"Failed to record {result.path} in the ledger: {e}")
+            return False
+        self.pending.append((os.path.abspath(result.path), size, result.mtime_ns, result.digest))
+        if len(self.pending) >= LEDGER_COMMIT_EVERY:
+            self.commit()
+        return True
+
+    def commit(self):
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO clean_files VALUES (?, ?, ?, ?)", self.pending)
+        self.pending = []
 
+    def own_files(self) -> Set[str]:
+        """Absolute paths of the database and the journal files SQLite may keep next to it."""
+        return {self.path + suffix for suffix in ("", "-journal", "-wal", "-shm")}
 
-def main(directory_path: Union[str, Path]):
+
+def default_ledger_path(directory: Union[str, Path]) -> Path:
+    """Return the ledger file for directory under DEFAULT_LEDGER_DIR, named after its absolute path."""
+    digest = hashlib.sha256(os.path.abspath(str(directory)).encode("utf-8")).hexdigest()[:16]
+    return DEFAULT_LEDGER_DIR / f"{digest}.sqlite"
+
+
+def iter_files(directory: Union[str, Path], exclude: Optional[Set[str]] = None) -> Iterator[str]:
+    """
+    Yield every file below directory, recursively, as the walk reaches it,
+    leaving out our temp files and the absolute paths in exclude.
+    """
+    stack = [str(directory)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False) and not entry.name.startswith(TEMP_PREFIX):
+                    if exclude and os.path.abspath(entry.path) in exclude:
+                        continue
+                    yield entry.path
+
+
+def scrub_tree(directory: Union[str, Path], jobs: Optional[int] = None, ledger: Optional[CleanLedger] = None) -> Dict[str, dict]:
+    """
+    Remove metadata from every supported file below directory.
+
+    PDFs go to a process pool with one worker per core (or `jobs`) and JPEGs
+    to a thread pool. Only a bounded number of files is queued at a time, so
+    the walk streams through trees of any size. Files the ledger knows to be
+    clean are skipped, and files that turn out to be clean already are never
+    rewritten, so unchanged files keep their bytes and mtime.
+
+    Returns per-format totals: {extension: {"files", "failed", "clean", "bytes", "seconds"}}.
     """
-    Iterate through files in the given directory and remove metadata.
+    jobs = jobs or os.cpu_count() or 1
+    max_in_flight = (jobs + IO_THREADS) * 4
+    stats: Dict[str, dict] = defaultdict(lambda: {"files": 0, "failed": 0, "clean": 0, "bytes": 0, "seconds": 0.0})
+    skipped = 0
+    unchanged = 0
+
+    with ProcessPoolExecutor(max_workers=jobs) as processes, ThreadPoolExecutor(max_workers=IO_THREADS) as threads:
+        in_flight = set()
+        # A ledger the user placed inside the tree is not part of it
+        paths = iter_files(directory, ledger.own_files() if ledger is not None else None)
+        while True:
+            for path in paths:
+                extension = Path(path).suffix.lower()
+                if extension not in SUPPORTED_EXTENSIONS:
+                    logging.info(f"Metadata removal is not supported for {extension} files, skipping {path}")
+                    skipped += 1
+                    continue
+                known_digest = None
+                if ledger is not None:
+                    skip, known_digest = ledger.check(path)
+                    if skip:
+                        unchanged += 1
+                        continue
+                pool = processes if extension in CPU_BOUND_EXTENSIONS else threads
+                in_flight.add(pool.submit(scrub_file, path, known_digest))
+                if len(in_flight) >= max_in_flight:
+                    break
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                ok = result.ok
+                if ledger is not None and ok:
+                    ok = ledger.record(result)
+                totals = stats[result.extension]
+                totals["files"] += 1
+                totals["failed"] += not ok
+                totals["clean"] += result.skipped
+                totals["bytes"] += result.size
+                totals["seconds"] += result.seconds
+
+    if ledger is not None:
+        ledger.commit()
+        logging.info(f"Skipped {unchanged} files unchanged since the ledger recorded them as clean")
+    if skipped:
+        logging.info(f"Skipped {skipped} files with unsupported extensions")
+    return dict(stats)
+
+
+def log_throughput(stats: Dict[str, dict], elapsed: float):
+    """Log per-format file and byte throughput for a scrub_tree run."""
+    for extension, totals in sorted(stats.items()):
+        busy = totals["seconds"] or 1e-9
+        logging.info(
+            f"{extension}: {totals['files']} files ({totals['failed']} failed, {totals['clean']} already clean), "
+            f"{totals['bytes'] / 1e6:.1f} MB, {totals['files'] / busy:.1f} files/s and "
+            f"{totals['bytes'] / 1e6 / busy:.1f} MB/s per worker"
+        )
+    files = sum(totals["files"] for totals in stats.values())
+    logging.info(f"Processed {files} files in {elapsed:.2f}s ({files / max(elapsed, 1e-9):.1f} files/s overall)")
+
+
+def main(
+    directory_path: Union[str, Path],
+    jobs: Optional[int] = None,
+    ledger_path: Optional[Union[str, Path]] = None,
+    use_ledger: bool = True,
+    verify: bool = False,
+):
+    """
+    Remove metadata from every supported file in the given directory tree.
     """
     try:
         directory = Path(directory_path)
 
         if directory.is_dir():
-            for file in directory.iterdir():
-                if file.is_file():
-                    logging.info(f"Removing metadata from {file}")
-                    remove_metadata(file)
+            ledger = CleanLedger(ledger_path or default_ledger_path(directory), verify) if use_ledger else None
+            started = time.perf_counter()
+            stats = scrub_tree(directory, jobs, ledger)
+            log_throughput(stats, time.perf_counter() - started)
         else:
             logging.error("Invalid directory path provided.")
 
@@ -85,5 +874,13 @@ def main(directory_path: Union[str, Path]):
 
 
 if __name__ == "__main__":
-    directory_path = input("Enter the directory path: ")
-    main(directory_path)
+    parser = argparse.ArgumentParser(description="Remove metadata from JPEG and PDF files")
+    parser.add_argument("directory", nargs="?", help="Directory to scrub recursively (prompted for if omitted)")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Worker processes for PDFs (default: one per core)")
+    parser.add_argument("--ledger", help=f"Ledger of clean files (default: a per-directory file in {DEFAULT_LEDGER_DIR})")
+    parser.add_argument("--no-ledger", action="store_true", help="Check every file instead of trusting the ledger")
+    parser.add_argument("--verify", action="store_true", help="Re-hash files in the ledger instead of trusting size and mtime")
+    args = parser.parse_args()
+
+    directory_path = args.directory or input("Enter the directory path: ")
+    main(directory_path, args.jobs, args.ledger, not args.no_ledger, args.verify)
@@ -3,62 +3,237 @@
 # Email: githubtools@jamessawyer.co.uk
 # Website: http://www.jamessawyer.co.uk/
 
-def calculate_subnet(ip_address, mask):
-    # Split the IP address and subnet mask into their respective parts
-    ip_parts = ip_address.split("/")
-    ip = ip_parts[0]
-    mask = int(ip_parts[1])
+import ipaddress
 
-    # Convert the IP address and mask to binary
-    ip_binary = "".join([bin(int(x) + 256)[3:] for x in ip.split(".")])
-    mask_binary = "1" * mask + "0" * (32 - mask)
+import numpy as np
 
-    # Calculate the network address and broadcast address
-    network_address_binary = ip_binary[:mask] + "0" * (32 - mask)
-    broadcast_address_binary = ip_binary[:mask] + "1" * (32 - mask)
+# All-ones values used to build masks without overflowing the shifts
+_ALL_ONES_32 = np.uint64(0xFFFFFFFF)
+_ALL_ONES_64 = np.uint64(0xFFFFFFFFFFFFFFFF)
 
-    # Convert the binary values to decimal notation
-    network_address = ".".join([str(int(x, 2)) for x in [network_address_binary[0:8], network_address_binary[8:16], network_address_binary[16:24], network_address_binary[24:32]]])
-    broadcast_address = ".".join([str(int(x, 2)) for x in [broadcast_address_binary[0:8], broadcast_address_binary[8:16], broadcast_address_binary[16:24], broadcast_address_binary[24:32]]])
 
-    # Calculate the range of host addresses
-    host_min = network_address.split(".")
-    host_max = broadcast_address.split(".")
+def ipv4_to_uint32(addresses):
+    """
+    Convert an iterable of dotted-quad IPv4 strings to a uint32 array.
 
-    # Increment the fourth octet of the minimum host address by 1
-    host_min[3] = str(int(host_min[3]) + 1)
+    Args:
+        addresses (iterable of str): IPv4 addresses, e.g. "10.0.0.1".
 
-    # Decrement the fourth octet of the maximum host address by 1
-    host_max[3] = str(int(host_max[3]) - 1)
+    Returns:
+        numpy.ndarray: uint32 array with one integer per address.
+    """
+    addresses = list(addresses)
+    if not addresses:
+        return np.empty(0, dtype=np.uint32)
 
-    # Calculate the number of valid hosts
-    num_hosts = 2 ** (32 - mask) - 2
+    # Every address needs exactly three dots, otherwise the joined split below
+    # would silently shift octets from one address into the next
+    dots = np.char.count(np.asarray(addresses, dtype=str), ".")
+    bad = np.flatnonzero(dots != 3)
+    if bad.size:
+        raise ValueError(f"Invalid IPv4 address(es): {[addresses[i] for i in bad[:10]]}")
 
-    # Return the results
-    return (network_address, broadcast_address, ".".join(host_min), ".".join(host_max), num_hosts)
+    # Split every address in one go and let NumPy do the string -> int conversion
+    octets = np.array(".".join(addresses).split("."), dtype=np.int64).reshape(-1, 4)
+    if (octets < 0).any() or (octets > 255).any():
+        raise ValueError("IPv4 octet out of range")
+
+    return ((octets[:, 0] << 24) | (octets[:, 1] << 16) | (octets[:, 2] << 8) | octets[:, 3]).astype(np.uint32)
+
+
+def uint32_to_ipv4(values):
+    """Convert a uint32 array back to a list of dotted-quad strings."""
+    return [str(ipaddress.IPv4Address(int(v))) for v in np.asarray(values)]
+
+
+def ipv6_to_pairs(addresses):
+    """
+    Convert an iterable of IPv6 strings to (high, low) uint64 arrays.
+
+    Args:
+        addresses (iterable of str): IPv6 addresses, e.g. "2001:db8::1".
+
+    Returns:
+        tuple: (high, low) uint64 arrays holding the upper and lower 64 bits.
+    """
+    values = [int(ipaddress.IPv6Address(a)) for a in addresses]
+    high = np.array([v >> 64 for v in values], dtype=np.uint64)
+    low = np.array([v & 0xFFFFFFFFFFFFFFFF for v in values], dtype=np.uint64)
+    return high, low
+
+
+def pairs_to_ipv6(high, low):
+    """Convert (high, low) uint64 arrays back to a list of IPv6 strings."""
+    return [str(ipaddress.IPv6Address((int(h) << 64) | int(l))) for h, l in zip(np.asarray(high), np.asarray(low))]
+
+
+def searchsorted_v6(key_high, key_low, high, low):
+    """
+    Count the sorted 128-bit keys at or below each 128-bit query.
+
+    This is np.searchsorted(keys, queries, side="right") for addresses held as
+    (high, low) uint64 halves. Keys must be sorted by (high, low).
+
+    Returns:
+        numpy.ndarray: int64 counts, one per query.
+    """
+    key_high = np.asarray(key_high, dtype=np.uint64)
+    key_low = np.asarray(key_low, dtype=np.uint64)
+    high = np.asarray(high, dtype=np.uint64)
+    low = np.asarray(low, dtype=np.uint64)
+
+    if not key_low.any():
+        # Keys on /64 boundaries (or shorter) only differ in the high half
+        return np.searchsorted(key_high, high, side="right").astype(np.int64)
+
+    # Merge keys and queries in one lexsort and count the keys sorted before each query
+    n = len(key_high)
+    is_query = np.concatenate([np.zeros(n, dtype=np.int8), np.ones(len(high), dtype=np.int8)])
+    order = np.lexsort((is_query, np.concatenate([key_low, low]), np.concatenate([key_high, high])))
+    keys_seen = np.cumsum(order < n)
+    counts = np.empty(len(high), dtype=np.int64)
+    query_slots = order >= n
+    counts[order[query_slots] - n] = keys_seen[query_slots]
+    return counts
+
+
+def _host_mask(prefixlens, width):
+    """Return the host-bit mask (the inverse of the netmask) for each prefix length."""
+    host_bits = width - prefixlens.astype(np.int64)
+    # Shifting a uint64 by 64 is undefined, so clamp and patch the full-width case
+    shift = np.minimum(host_bits, 63).astype(np.uint64)
+    mask = (np.uint64(1) << shift) - np.uint64(1)
+    return np.where(host_bits >= 64, _ALL_ONES_64, mask)
+
+
+def calculate_subnets(addresses, prefixlens):
+    """
+    Calculate subnet facts for many IPv4 addresses at once.
+
+    /31 networks (RFC 3021) have two usable hosts and /32 networks have one,
+    so for those the host range covers the whole network.
+
+    Args:
+        addresses (array-like): uint32 IPv4 addresses.
+        prefixlens (array-like): uint8 prefix lengths (0-32), broadcastable to addresses.
+
+    Returns:
+        dict: uint32 arrays "network", "broadcast", "first_host", "last_host"
+        and a uint64 array "num_hosts".
+    """
+    addresses = np.asarray(addresses, dtype=np.uint32).astype(np.uint64)
+    # Check the range before narrowing to uint8, which rejects negatives with OverflowError
+    prefixlens = np.asarray(prefixlens, dtype=np.int64)
+    if ((prefixlens < 0) | (prefixlens > 32)).any():
+        raise ValueError("IPv4 prefix length must be between 0 and 32")
+    prefixlens = prefixlens.astype(np.uint8)
+    addresses, prefixlens = np.broadcast_arrays(addresses, prefixlens)
+
+    host = _host_mask(prefixlens, 32)
+    network = addresses & (~host & _ALL_ONES_32)
+    broadcast = network | host
+
+    # Networks smaller than /31 lose the network and broadcast addresses
+    has_reserved = prefixlens < 31
+    first_host = np.where(has_reserved, network + np.uint64(1), network)
+    last_host = np.where(has_reserved, broadcast - np.uint64(1), broadcast)
+    num_hosts = np.where(has_reserved, host - np.uint64(1), host + np.uint64(1))
+
+    return {
+        "network": network.astype(np.uint32),
+        "broadcast": broadcast.astype(np.uint32),
+        "first_host": first_host.astype(np.uint32),
+        "last_host": last_host.astype(np.uint32),
+        "num_hosts": num_hosts,
+    }
+
+
+def calculate_subnets_v6(high, low, prefixlens):
+    """
+    Calculate subnet facts for many IPv6 addresses held as 128-bit (high, low) pairs.
+
+    IPv6 has no broadcast address, so "broadcast" is the last address of the
+    network and the host range spans the whole network.
+
+    Args:
+        high (array-like): uint64 upper 64 bits of each address.
+        low (array-like): uint64 lower 64 bits of each address.
+        prefixlens (array-like): uint8 prefix lengths (0-128).
+
+    Returns:
+        dict: (high, low) uint64 pairs for "network", "broadcast", "first_host"
+        and "last_host", plus a float64 "num_hosts" (exact for powers of two).
+    """
+    high = np.asarray(high, dtype=np.uint64)
+    low = np.asarray(low, dtype=np.uint64)
+    # Check the range before narrowing to uint8, which rejects negatives with OverflowError
+    prefixlens = np.asarray(prefixlens, dtype=np.int64)
+    if ((prefixlens < 0) | (prefixlens > 128)).any():
+        raise ValueError("IPv6 prefix length must be between 0 and 128")
+    prefixlens = prefixlens.astype(np.uint8)
+    high, low, prefixlens = np.broadcast_arrays(high, low, prefixlens)
+
+    # Split the prefix between the two halves of the address
+    high_prefix = np.minimum(prefixlens, 64)
+    low_prefix = np.maximum(prefixlens.astype(np.int64) - 64, 0)
+    high_host = _host_mask(high_prefix, 64)
+    low_host = _host_mask(low_prefix, 64)
+
+    network = (high & ~high_host, low & ~low_host)
+    broadcast = (network[0] | high_host, network[1] | low_host)
+    num_hosts = np.exp2(128.0 - prefixlens.astype(np.float64))
+
+    return {
+        "network": network,
+        "broadcast": broadcast,
+        "first_host": network,
+        "last_host": broadcast,
+        "num_hosts": num_hosts,
+    }
 
-# Prompt the user to enter the IP address and subnet mask
-ip_address = input("Enter the IP address and subnet mask (in CIDR notation): ")
 
-try:
+def calculate_subnet(ip_address, mask):
     # Split the IP address and subnet mask into their respective parts
     ip_parts = ip_address.split("/")
     ip = ip_parts[0]
     mask = int(ip_parts[1])
 
-    # Calculate the subnet information
-    network_address, broadcast_address, host_range_min, host_range_max, num_hosts = calculate_subnet(ip_address, mask)
+    # Run the single address through the vectorized engine
+    result = calculate_subnets(ipv4_to_uint32([ip]), [mask])
+
+    network_address = uint32_to_ipv4(result["network"])[0]
+    broadcast_address = uint32_to_ipv4(result["broadcast"])[0]
+    host_min = uint32_to_ipv4(result["first_host"])[0]
+    host_max = uint32_to_ipv4(result["last_host"])[0]
+    num_hosts = int(result["num_hosts"][0])
+
+    # Return the results
+    return (network_address, broadcast_address, host_min, host_max, num_hosts)
+
+
+if __name__ == "__main__":
+    # Prompt the user to enter the IP address and subnet mask
+    ip_address = input("Enter the IP address and subnet mask (in CIDR notation): ")
+
+    try:
+        # Split the IP address and subnet mask into their respective parts
+        ip_parts = ip_address.split("/")
+        ip = ip_parts[0]
+        mask = int(ip_parts[1])
+
+        # Calculate the subnet information
+        network_address, broadcast_address, host_range_min, host_range_max, num_hosts = calculate_subnet(ip_address, mask)
 
-    # print the results using tabulate
+        # print the results using tabulate
 
-    from tabulate import tabulate
+        from tabulate import tabulate
 
-    headers = ["Network address", "Broadcast address", "Range of hosts", "Number of hosts"]
+        headers = ["Network address", "Broadcast address", "Range of hosts", "Number of hosts"]
 
-    data = [[network_address, broadcast_address, host_range_min + " - " + host_range_max, num_hosts]]
+        data = [[network_address, broadcast_address, host_range_min + " - " + host_range_max, num_hosts]]
 
-    print(tabulate(data, headers, tablefmt="grid"))
+        print(tabulate(data, headers, tablefmt="grid"))
 
 
-except ValueError:
-    print("Error: Invalid IP address or subnet mask")
+    except ValueError:
+        print("Error: Invalid IP address or subnet mask")
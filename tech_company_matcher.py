@@ -0,0 +1,238 @@
+# Description: Find mentions of big tech companies in large text dumps
+# Author: James Sawyer
+# Email: githubtools@jamessawyer.co.uk
+# Website: http://www.jamessawyer.co.uk/
+
+"""Scans text for the companies listed in the header of tech_companies_summary.txt.
+
+The company names are compiled into an Aho-Corasick automaton, so a corpus is
+scanned in a single pass whose cost does not depend on how many names there
+are, unlike a large alternation regex which backtracks on every position.
+Matching is case-insensitive and only whole words count ("Meta" does not match
+inside "metadata").
+
+Text is fed in chunks, so multi-GB comment dumps can be streamed from disk;
+matches that straddle a chunk boundary are still found.
+
+Usage:
+    python tech_company_matcher.py comments.txt
+    zcat dump.txt.gz | python tech_company_matcher.py --matches
+"""
+
+import argparse
+import collections
+import logging
+import os
+import re
+import sys
+
+from tabulate import tabulate
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format="%(asctime)s [%(levelname)s] %(message)s",
+                    datefmt="%Y-%m-%d %H:%M:%S")
+
+SUMMARY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tech_companies_summary.txt")
+CHUNK_SIZE = 1 << 20
+
+Match = collections.namedtuple("Match", ["company", "start", "end"])
+
+
+def load_company_names(path=SUMMARY_FILE):
+    """
+    Read the company names from the bullet list in the summary file header.
+
+    Each bullet looks like "- Category: such as Amazon, Google, ... known for ...";
+    every capitalised word after the colon is a company name.
+    """
+    names = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            if line.startswith("DataFrame Contents"):
+                break
+            if line.startswith("- ") and ":" in line:
+                for name in re.findall(r"\b[A-Z][A-Za-z]+\b", line.split(":", 1)[1]):
+                    if name not in names:
+                        names.append(name)
+    return names
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == "_"
+
+
+def _lower(text):
+    """Lowercase without changing the length, so offsets still line up with the input."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+
+class CompanyMatcher:
+    """Case-insensitive, whole-word Aho-Corasick matcher over a list of names."""
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.counts = collections.Counter()
+
+        # State 0 is the root; goto[s] maps a character to the next state
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for name in self.names:
+            state = 0
+            for char in _lower(name):
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._out[state].append((name, len(name)))
+
+        # Breadth-first pass to fill in the failure links and merge outputs;
+        # children of the root keep failing back to the root
+        queue = collections.deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+        self._longest = max((len(n) for n in self.names), default=0)
+        # From the root a match can only begin at a word start whose first
+        # letter starts some name, so the scan jumps straight to the next one
+        first_chars = "".join(re.escape(c) for c in self._goto[0])
+        self._next_start = re.compile(rf"(?<!\w)[{first_chars}]") if first_chars else re.compile(r"(?!)")
+        self.reset()
+
+    def reset(self):
+        """Forget the stream position and counts so a new corpus can be scanned."""
+        self.counts.clear()
+        self._state = 0
+        self._offset = 0
+        # Tail of the text seen so far, long enough to check the left boundary of any match
+        self._tail = ""
+        # Matches ending on the last character of a chunk wait for the next one
+        self._pending = []
+
+    def feed(self, chunk):
+        """
+        Scan the next chunk of the stream.
+
+        Returns:
+            list: Match(company, start, end) tuples, with offsets counted from
+            the start of the stream and `end` exclusive.
+        """
+        if not chunk:
+            return []
+
+        matches = self._resolve_pending(chunk[0])
+        text = self._tail + _lower(chunk)
+        base = self._offset - len(self._tail)
+        start_at = len(self._tail)
+        size = len(text)
+
+        goto, fail, out = self._goto, self._fail, self._out
+        next_start = self._next_start.search
+        state = self._state
+        i = start_at - 1
+        while True:
+            i += 1
+            if not state:
+                found = next_start(text, i)
+                if found is None:
+                    break
+                i = found.start()
+            elif i == size:
+                break
+            char = text[i]
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not out[state]:
+                continue
+            for name, length in out[state]:
+                begin = i - length + 1
+                if begin > 0 and _is_word_char(text[begin - 1]):
+                    continue
+                match = Match(name, base + begin, base + i + 1)
+                if i + 1 == size:
+                    self._pending.append(match)
+                elif not _is_word_char(text[i + 1]):
+                    matches.append(match)
+
+        self._state = state
+        self._offset += len(chunk)
+        self._tail = text[-(self._longest + 1):]
+        self._count(matches)
+        return matches
+
+    def finish(self):
+        """Flush matches that ended on the final character of the stream."""
+        matches, self._pending = self._pending, []
+        self._count(matches)
+        return matches
+
+    def _resolve_pending(self, next_char):
+        matches = [] if _is_word_char(next_char) else self._pending
+        self._pending = []
+        return matches
+
+    def _count(self, matches):
+        for match in matches:
+            self.counts[match.company] += 1
+
+    def scan(self, chunks):
+        """Scan an iterable of text chunks, yielding every match in stream order."""
+        self.reset()
+        for chunk in chunks:
+            yield from self.feed(chunk)
+        yield from self.finish()
+
+
+def read_chunks(fh, chunk_size=CHUNK_SIZE):
+    """Yield a text file in fixed-size chunks."""
+    while True:
+        chunk = fh.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count mentions of big tech companies in text")
+    parser.add_argument("files", nargs="*", help="Text files to scan (default: stdin)")
+    parser.add_argument("--summary", default=SUMMARY_FILE, help="Path to tech_companies_summary.txt")
+    parser.add_argument("--company", action="append", default=[], help="Extra company name to match")
+    parser.add_argument("--matches", action="store_true", help="Print every match, not just the counts")
+    args = parser.parse_args()
+
+    names = load_company_names(args.summary) + args.company
+    logging.info(f"Matching {len(names)} company names")
+    matcher = CompanyMatcher(names)
+
+    totals = collections.Counter()
+    sources = args.files or ["-"]
+    for source in sources:
+        fh = sys.stdin if source == "-" else open(source, encoding="utf-8", errors="replace")
+        try:
+            for match in matcher.scan(read_chunks(fh)):
+                if args.matches:
+                    print(f"{source}:{match.start}-{match.end} {match.company}")
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+        totals.update(matcher.counts)
+
+    print(tabulate(totals.most_common(), headers=["Company", "Mentions"], tablefmt="psql"))
+
+
+if __name__ == "__main__":
+    main()